@@ -62,22 +62,15 @@ def build_session():
 
     cookies = scrapper_get(f"/api/v1/session/cookies?domain={TARGET_DOMAIN}")
     fp      = scrapper_get(f"/api/v1/fingerprint?domain={TARGET_DOMAIN}")
-    recent  = scrapper_get(f"/api/v1/requests/recent?limit=100&domain={TARGET_DOMAIN}")
+    hdr     = scrapper_get(f"/api/v1/headers/latest?domain={TARGET_DOMAIN}&name=anthropic-device-id")
 
     if not cookies:
         print(f"\n[!] No cookies found for {TARGET_DOMAIN}.")
         print(f"    Open {TARGET_DOMAIN} in your browser, log in, click around, then retry.\n")
         sys.exit(1)
 
-    # Hunt for anthropic-device-id in recent captured requests
-    device_id = None
-    for req in reversed(recent):
-        for key, val in req.get("headers", {}).items():
-            if key.lower() == "anthropic-device-id":
-                device_id = val
-                break
-        if device_id:
-            break
+    # Latest anthropic-device-id seen in captured requests
+    device_id = hdr.get("value")
 
     if not device_id:
         print("\n[!] Could not find anthropic-device-id in captured requests.")
@@ -62,22 +62,22 @@ def build_session():
     print("[*] Fetching session from SCRAPPER...")
     cookies = scrapper_get(f"/api/v1/session/cookies?domain={TARGET_DOMAIN}")
     fp      = scrapper_get(f"/api/v1/fingerprint?domain={TARGET_DOMAIN}")
-    recent  = scrapper_get(f"/api/v1/requests/recent?limit=300&domain={TARGET_DOMAIN}")
+    auth    = scrapper_get(f"/api/v1/headers/latest?domain={TARGET_DOMAIN}&name=authorization")
+    did_req = scrapper_get(f"/api/v1/query?domain={TARGET_DOMAIN}&url_re=did%3D%5Ba-f0-9-%5D%7B36%7D&limit=1&fields=url")
 
     if not cookies:
         print(f"\n[!] No cookies. Log into {TARGET_DOMAIN} and retry.\n"); sys.exit(1)
 
     bearer = None
-    for req in reversed(recent):
-        auth = req.get("headers", {}).get("authorization", "")
-        if auth.startswith("Bearer "):
-            bearer = auth.split(" ", 1)[1]; break
+    for v in auth.get("values", []):
+        if str(v["value"]).startswith("Bearer "):
+            bearer = v["value"].split(" ", 1)[1]; break
     if not bearer:
         print("\n[!] No bearer token. Browse DeepSeek more then retry.\n"); sys.exit(1)
 
     device_id = None
-    for req in recent:
-        m = re.search(r'did=([a-f0-9\-]{36})', req.get("url", ""))
+    for req in did_req:
+        m = re.search(r'did=([a-f0-9\-]{36})', req.get("url") or "")
         if m:
             device_id = m.group(1); break
     if not device_id:
@@ -5,22 +5,40 @@ All stdlib — no pip, no venv needed.
 Run: python3 api.py
 """
 
+import base64
+import gzip
 import json
+import math
+import mmap
+import queue
+import re
 import random
+import select
 import io
 import csv
+import heapq
 import os
+import pickle
+import shutil
 import socket
+import struct
 import subprocess
+import sys
 import threading
 import time
+import weakref
 import zipfile
-from collections import defaultdict
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice, repeat
 from datetime import datetime, timezone
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from socketserver import ThreadingMixIn
 from pathlib import Path
-from urllib.parse import urlparse, parse_qs
+from urllib.parse import urlparse, parse_qs, parse_qsl
 
 class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
     daemon_threads = True
@@ -37,26 +55,1842 @@ API_PORT     = 8080
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 LOGS_DIR.mkdir(parents=True, exist_ok=True)
 
+# In-memory retention per capture kind, applied to each domain separately.
+# max_items / max_bytes (JSON line size) / max_age (s); None = keep forever.
+# Only the in-memory store is trimmed — the .jsonl files are never touched.
+RETENTION = {
+    "bodies":     {"max_items": 20_000,  "max_bytes": 256 << 20, "max_age": None},
+    "websockets": {"max_items": 50_000,  "max_bytes": 64 << 20,  "max_age": 6 * 3600},
+    "ws_frames":  {"max_items": 50_000,  "max_bytes": 64 << 20,  "max_age": 6 * 3600},
+}
+RETENTION_DOMAINS  = {}      # domain → {kind → limits}, overrides RETENTION
+RETENTION_INTERVAL = 5       # s between background eviction passes
+
 # ── In-memory store ───────────────────────────────────────────────────────────
 
-store = {
-    "requests":      defaultdict(list),
-    "responses":     defaultdict(list),
-    "bodies":        defaultdict(list),
-    "auth":          defaultdict(list),
-    "cookies":       defaultdict(list),
-    "websockets":    defaultdict(list),
-    "ws_frames":     defaultdict(list),      # ← NEW: parsed frames
-    "ws_connections":defaultdict(list),      # ← NEW: open/close/handshake
-    "dommaps":       defaultdict(list),
-    "storage":       defaultdict(list),
-    "fingerprints":  defaultdict(list),
-}
-store_lock = threading.Lock()
+CAPTURE_KINDS = (
+    "requests", "responses", "bodies", "auth", "cookies",
+    "websockets",
+    "ws_frames",        # ← NEW: parsed frames
+    "ws_connections",   # ← NEW: open/close/handshake
+    "dommaps", "storage", "fingerprints",
+)
+
+
+TERM_FIELDS  = ("method", "status")    # low-cardinality fields with a posting-list index
+SELECT_CHUNK = 256                     # records select() reads per read-lock hold
+_LAST        = "\U0010ffff"            # sorts after any domain, for inclusive timeline bounds
+
+def _ts(obj):
+    ts = obj.get("timestamp")
+    return ts if isinstance(ts, (int, float)) else 0
+
+
+# ── Compact records ───────────────────────────────────────────────────────────
+#
+# Requests and responses are the bulk of a long session. Instead of one
+# decoded dict each, they are kept as slotted records whose repeated parts
+# are shared: key order ("shape"), header-name tuples, flag sets and domains
+# are interned once, and header values sit in a plain tuple. Records answer
+# .get() / [] / keys() like the dicts they replace and serialize back to
+# the identical JSON via _json_default.
+
+FLAG_BITS = {}               # flag → bit, assigned in first-seen order
+_interned = {}               # shared tuples: shapes, header names, flag sets
+_flagsets = {}               # flags tuple → (interned tuple, bitmask)
+
+def _intern_tuple(t):
+    return _interned.setdefault(t, t)
+
+def _flagset(flags):
+    flags = tuple(flags)
+    hit = _flagsets.get(flags)
+    if hit is None:
+        mask = 0
+        for fl in flags:
+            mask |= 1 << FLAG_BITS.setdefault(fl, len(FLAG_BITS))
+        hit = _flagsets[flags] = (_intern_tuple(flags), mask)
+    return hit
+
+def flag_mask(flags):
+    """Bitmask for `flags`; unknown flags map to no bits."""
+    mask = 0
+    for fl in flags:
+        bit = FLAG_BITS.get(fl)
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
+
+
+class _CompactRecord:
+    """Read-only, dict-like capture record with interned repeated parts."""
+    __slots__ = ("_shape", "_extra")
+    FIELDS  = ()                 # keys held in slots; anything else goes to _extra
+    HEADERS = ()                 # header-dict fields, stored as (names, values)
+    STRINGS = ()                 # low-cardinality strings worth interning
+
+    def __init__(self, obj):
+        extra = None
+        for k, v in obj.items():
+            if k in self.FIELDS:
+                object.__setattr__(self, k, self._encode(k, v))
+            else:
+                if extra is None:
+                    extra = {}
+                extra[k] = v
+        self._shape = _intern_tuple(tuple(obj))
+        self._extra = extra
+
+    def _encode(self, k, v):
+        if k == "flags" and isinstance(v, list) and all(type(f) is str for f in v):
+            return _flagset(v)
+        if k in self.HEADERS and isinstance(v, dict):
+            return (_intern_tuple(tuple(sys.intern(n) for n in v)), tuple(v.values()))
+        if k in self.STRINGS and isinstance(v, str):
+            return sys.intern(v)
+        return v
+
+    def _decode(self, k, v):
+        if k == "flags" and type(v) is tuple:
+            return list(v[0])
+        if k in self.HEADERS and type(v) is tuple:
+            return dict(zip(*v))
+        return v
+
+    @property
+    def mask(self):
+        fs = getattr(self, "flags", None)
+        return fs[1] if type(fs) is tuple else 0
+
+    def header(self, name, field="headers"):
+        """One header value, without rebuilding the header dict."""
+        names, values = self.header_items(field)
+        return values[names.index(name)] if name in names else None
+
+    def header_items(self, field="headers"):
+        """(names, values) of a header field, without rebuilding the header dict."""
+        v = getattr(self, field, None) if field in self._shape and field in self.FIELDS else self.get(field)
+        if type(v) is tuple:
+            return v
+        return (tuple(v), tuple(v.values())) if isinstance(v, dict) else ((), ())
+
+    def get(self, key, default=None):
+        if key in self.FIELDS:
+            if key in self._shape:
+                return self._decode(key, getattr(self, key))
+            return default
+        return self._extra.get(key, default) if self._extra else default
+
+    def __getitem__(self, key):
+        if key not in self._shape:
+            raise KeyError(key)
+        return self.get(key)
+
+    def __contains__(self, key):
+        return key in self._shape
+
+    def keys(self):
+        return self._shape
+
+    def to_dict(self):
+        return {k: self.get(k) for k in self._shape}
+
+    def __getstate__(self):
+        return (self._shape, self._extra, tuple(getattr(self, k, None) for k in self.FIELDS))
+
+    def __setstate__(self, state):
+        shape, extra, values = state
+        self._shape, self._extra = _intern_tuple(shape), extra
+        for k, v in zip(self.FIELDS, values):
+            if k in shape:
+                if k == "flags" and type(v) is tuple:
+                    v = _flagset(v[0])
+                elif k in self.HEADERS and type(v) is tuple:
+                    v = (_intern_tuple(v[0]), v[1])
+                elif k in self.STRINGS and isinstance(v, str):
+                    v = sys.intern(v)
+                object.__setattr__(self, k, v)
+
+
+class RequestRecord(_CompactRecord):
+    FIELDS  = ("type", "domain", "url", "method", "headers", "postData",
+               "reqType", "flags", "requestId", "timestamp")
+    __slots__ = FIELDS
+    HEADERS = ("headers",)
+    STRINGS = ("type", "domain", "method", "reqType")
+
+
+class ResponseRecord(_CompactRecord):
+    FIELDS  = ("type", "domain", "url", "status", "statusText", "headers", "mimeType",
+               "requestId", "reqMethod", "reqHeaders", "reqPostData", "flags", "timestamp")
+    __slots__ = FIELDS
+    HEADERS = ("headers", "reqHeaders")
+    STRINGS = ("type", "domain", "statusText", "mimeType", "reqMethod")
+
+
+class FrameRecord(_CompactRecord):
+    FIELDS  = ("type", "subtype", "direction", "requestId", "domain", "tabId", "timestamp",
+               "payload", "opcode", "parsed", "flags", "extracted", "connStats")
+    __slots__ = FIELDS
+    STRINGS = ("type", "subtype", "direction", "domain")
+
+
+class _BodySource:
+    """A capture file that body records point into, read through mmap.
+
+    Holds its own descriptor, so records stay readable after the file is
+    renamed. Sources are shared per (path, inode) and close once the last
+    record referencing them is evicted. A source moved onto a compressed
+    segment reads through gzip instead (slower, but those bodies are cold).
+    """
+    _open = weakref.WeakValueDictionary()   # (path, inode) → source
+
+    def __init__(self, path, f=None, ino=None):
+        self.path = str(path)
+        self.lock = threading.Lock()
+        self.ino  = ino
+        self._f   = self._mm = None
+        self._attach(f)
+
+    @classmethod
+    def of(cls, path, f=None):
+        ino = os.fstat(f.fileno()).st_ino if f else os.stat(path).st_ino
+        src = cls._open.get((str(path), ino))
+        if src is None:
+            src = cls._open[(str(path), ino)] = cls(path, f)
+        return src
+
+    @classmethod
+    def moved(cls, old, new, ino=None):
+        """Repoint sources on `old` (one inode, or all) at `new`: a sealed or compressed segment."""
+        for (path, i), src in list(cls._open.items()):
+            if path == str(old) and ino in (None, i):
+                cls._open.pop((path, i), None)
+                src._relocate(new)
+                cls._open[(src.path, src.ino)] = src
+
+    def _attach(self, f=None):
+        """Open the file behind this source. Left detached if it is gone or was replaced."""
+        self._gz = self.path.endswith(".gz")
+        try:
+            if self._gz:
+                self._f = gzip.open(self.path, "rb")
+            else:
+                self._f = os.fdopen(os.dup(f.fileno()), "rb") if f else open(self.path, "rb")
+            ino = os.fstat(self._f.fileno()).st_ino
+        except OSError:
+            self._f = None
+            return
+        if self.ino is not None and ino != self.ino and not self._gz:
+            self._f.close()
+            self._f = None
+        else:
+            self.ino = ino
+
+    def _relocate(self, path):
+        with self.lock:
+            self.path = str(path)
+            if self._f is not None and not self.path.endswith(".gz"):
+                return                      # plain rename: the descriptor still points at it
+            if self._mm is not None:
+                self._mm.close()
+            if self._f is not None:
+                self._f.close()
+            self._f = self._mm = self.ino = None
+            self._attach()
+
+    def read(self, off, length):
+        """Decode the JSON line at [off, off + length), or None."""
+        with self.lock:
+            if self._f is None:
+                return None
+            try:
+                if self._gz:
+                    raise ValueError("compressed segment")
+                if self._mm is None or off + length > len(self._mm):
+                    if self._mm is not None:
+                        self._mm.close()
+                    self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+                raw = self._mm[off:off + length]
+            except (ValueError, OSError):
+                self._f.seek(off)
+                raw = self._f.read(length)
+        try:
+            return json.loads(raw)
+        except Exception:
+            return None
+
+    def __reduce__(self):
+        return (_restore_body_source, (self.path, self.ino))
+
+def _restore_body_source(path, ino):
+    """Source for a snapshotted record; detached until load repoints it if the file has moved."""
+    src = _BodySource._open.get((path, ino))
+    if src is None:
+        src = _BodySource._open[(path, ino)] = _BodySource(path, ino=ino)
+    return src
+
+
+class BodyRecord(_CompactRecord):
+    """Response-body metadata; the body and headers stay in the capture file.
+
+    Fields outside FIELDS are fetched from disk by (offset, length) on
+    demand, so RSS no longer grows with the size of captured bodies.
+    """
+    FIELDS  = ("type", "domain", "url", "method", "status", "base64",
+               "mimeType", "requestId", "flags", "timestamp")
+    __slots__ = FIELDS + ("_src", "_off", "_len")
+    STRINGS = ("type", "domain", "method", "mimeType")
+
+    def __init__(self, obj, src, off, length):
+        for k in self.FIELDS:
+            if k in obj:
+                object.__setattr__(self, k, self._encode(k, obj[k]))
+        self._shape, self._extra = _intern_tuple(tuple(obj)), None
+        self._src, self._off, self._len = src, off, length
+
+    def _load(self):
+        obj = self._src.read(self._off, self._len) if self._src else None
+        if isinstance(obj, dict) and obj.get("requestId") == self.get("requestId"):
+            return obj
+        return None
+
+    def get(self, key, default=None):
+        if key in self.FIELDS or key not in self._shape:
+            return super().get(key, default)
+        obj = self._load()
+        return obj.get(key, default) if obj else default
+
+    def to_dict(self):
+        obj = self._load()
+        if obj is None:     # file gone or rewritten: metadata is all that is left
+            return {k: self.get(k) for k in self._shape if k in self.FIELDS}
+        return obj
+
+    def __getstate__(self):
+        return super().__getstate__() + ((self._src, self._off, self._len),)
+
+    def __setstate__(self, state):
+        super().__setstate__(state[:3])
+        self._src, self._off, self._len = state[3]
+
+
+COMPACT_KINDS = {"requests": RequestRecord, "responses": ResponseRecord, "ws_frames": FrameRecord}
+
+_BODY_FIELDS = frozenset(BodyRecord.FIELDS)
+
+def _out_of_line(key, objs, offsets, sizes, src):
+    """Swap decoded bodies for BodyRecords pointing at their line in `src`."""
+    if key != "bodies" or src is None:
+        return objs
+    return [BodyRecord(o, src, off, n) for o, off, n in zip(objs, offsets, sizes)]
+
+def _body_stubs(objs):
+    """Bodies with every value a BodyRecord reads from disk set to None. Keys
+    stay, in order, as they make up the record's shape."""
+    return [{k: v if k in _BODY_FIELDS else None for k, v in o.items()} for o in objs]
+
+def record_mask(obj):
+    """Flag bitmask of a captured record (compact or plain dict)."""
+    if isinstance(obj, _CompactRecord):
+        return obj.mask
+    flags = obj.get("flags")
+    return _flagset(flags)[1] if isinstance(flags, list) and all(type(f) is str for f in flags) else 0
+
+def header_value(obj, name, field="headers"):
+    """Header `name` of a captured record (compact or plain dict), or None."""
+    if isinstance(obj, _CompactRecord):
+        return obj.header(name, field)
+    h = obj.get(field)
+    return h.get(name) if isinstance(h, dict) else None
+
+def header_items(obj, field="headers"):
+    """(names, values) of a captured record's header field."""
+    if isinstance(obj, _CompactRecord):
+        return obj.header_items(field)
+    h = obj.get(field)
+    return (tuple(h), tuple(h.values())) if isinstance(h, dict) else ((), ())
+
+def _json_default(obj):
+    if isinstance(obj, _CompactRecord):
+        return obj.to_dict()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+class _Partition:
+    """One domain's records for one capture kind, append-only.
+
+    Records are addressed by a per-partition sequence number (seq). Indexes
+    hold seqs, not records, so they stay small and survive front eviction.
+    """
+    __slots__ = ("items", "sizes", "nbytes", "base", "by_time", "by_flag", "by_term", "by_rid")
+
+    def __init__(self):
+        self.items   = []                 # arrival order
+        self.sizes   = []                 # encoded size of each item
+        self.nbytes  = 0
+        self.base    = 0                  # seq of items[0]
+        self.by_time = []                 # sorted [(timestamp, seq)]
+        self.by_flag = defaultdict(list)  # flag → [seq] ascending
+        self.by_term = defaultdict(list)  # (field, value) for TERM_FIELDS → [seq] ascending
+        self.by_rid  = {}                 # requestId → seq (latest wins)
+
+    def append(self, obj, size):
+        seq = self.base + len(self.items)
+        self.items.append(obj)
+        self.sizes.append(size)
+        self.nbytes += size
+        entry = (_ts(obj), seq)
+        if not self.by_time or entry >= self.by_time[-1]:
+            self.by_time.append(entry)
+        else:
+            insort(self.by_time, entry)
+        flags = obj.get("flags")
+        if isinstance(flags, (list, tuple)):
+            for fl in flags:
+                if type(fl) is str:
+                    self.by_flag[fl].append(seq)
+        for f in TERM_FIELDS:
+            v = obj.get(f)
+            if v is not None and type(v) in (str, int):
+                self.by_term[(f, v)].append(seq)
+        rid = obj.get("requestId")
+        if rid and type(rid) in (str, int):
+            self.by_rid[rid] = seq
+        return seq
+
+    def get(self, seq):
+        i = seq - self.base
+        return self.items[i] if 0 <= i < len(self.items) else None
+
+    def page(self, after, limit, since=None, until=None):
+        """Up to `limit` (seq, item) after seq `after` in arrival order, with
+        timestamps in [since, until] when given."""
+        i = max(after + 1, self.base) - self.base
+        if since is None and until is None:
+            return [(self.base + j, self.items[j]) for j in range(i, min(i + limit, len(self.items)))]
+        lo = bisect_left(self.by_time, (since,)) if since is not None else 0
+        hi = bisect_right(self.by_time, (until, float("inf"))) if until is not None else len(self.by_time)
+        # Walk forward from the cursor, filtering on timestamp. Should that
+        # take longer than the window has entries, pick from the window.
+        since = float("-inf") if since is None else since
+        until = float("inf") if until is None else until
+        out   = []
+        for j in range(i, min(i + hi - lo, len(self.items))):
+            if since <= _ts(self.items[j]) <= until:
+                out.append((self.base + j, self.items[j]))
+                if len(out) == limit:
+                    return out
+        if i + hi - lo >= len(self.items):
+            return out
+        start = self.base + i
+        seqs  = heapq.nsmallest(limit, (seq for _, seq in map(self.by_time.__getitem__, range(lo, hi))
+                                        if seq >= start))
+        return [(seq, self.items[seq - self.base]) for seq in seqs]
+
+    def select(self, flags=(), terms=(), since=None, until=None):
+        """Seqs passing every given index constraint (any of `flags`, all of
+        `terms`, timestamp in [since, until]), newest first."""
+        lists = []
+        if flags:
+            lists.append(sorted(set().union(*(self.by_flag.get(fl, ()) for fl in flags))))
+        for t in terms:
+            lists.append(self.by_term.get(t, ()))
+        if since is not None or until is not None:
+            lo = bisect_left(self.by_time, (since,)) if since is not None else 0
+            hi = bisect_right(self.by_time, (until, float("inf"))) if until is not None else len(self.by_time)
+            lists.append(sorted(seq for _, seq in self.by_time[lo:hi]))
+        if not lists:
+            return range(self.base + len(self.items) - 1, self.base - 1, -1)
+        lists.sort(key=len)
+        rest = [set(l) for l in lists[1:]]
+        return [seq for seq in reversed(lists[0]) if all(seq in r for r in rest)]
+
+    def flagged(self, flags):
+        seqs = set()
+        for fl in flags:
+            seqs.update(self.by_flag.get(fl, ()))
+        return [self.items[s - self.base] for s in sorted(seqs)]
+
+    def overflow(self, limits, now_ms):
+        """How many of the oldest items the limits say must go."""
+        n, total = 0, len(self.items)
+        if limits.get("max_items") is not None:
+            n = max(n, total - limits["max_items"])
+        if limits.get("max_bytes") is not None:
+            kept = self.nbytes - sum(self.sizes[:n])     # bytes left after the max_items cut
+            while n < total and kept > limits["max_bytes"]:
+                kept -= self.sizes[n]
+                n += 1
+        if limits.get("max_age") is not None:
+            cutoff = now_ms - limits["max_age"] * 1000
+            while n < total and _ts(self.items[n]) < cutoff:
+                n += 1
+        return n
+
+    def evict(self, n):
+        """Drop the `n` oldest items and their index entries; returns them."""
+        dropped = self.items[:n]
+        freed   = sum(self.sizes[:n])
+        del self.items[:n], self.sizes[:n]
+        self.nbytes -= freed
+        self.base   += n
+        self.by_time = [e for e in self.by_time if e[1] >= self.base]
+        for index in (self.by_flag, self.by_term):
+            for k in list(index):
+                seqs = index[k]
+                del seqs[:bisect_left(seqs, self.base)]
+                if not seqs:
+                    del index[k]
+        for obj in dropped:
+            rid = obj.get("requestId")
+            if rid and self.by_rid.get(rid, self.base) < self.base:
+                del self.by_rid[rid]
+        return dropped, freed
+
+
+class RWLock:
+    """Many concurrent readers or one writer. Waiting writers block new
+    readers, so a stream of dashboard polls cannot starve ingest."""
+
+    def __init__(self):
+        self._cond    = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer  = False
+        self._waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class CaptureStore:
+    """Captured events per kind and domain, with insert-time indexes.
+
+    Indexes: by domain (one partition each), by timestamp order, by flag and
+    by requestId (latest record wins), plus a timeline per kind that orders
+    every domain's records by timestamp. Readers get shallow list copies, so
+    nothing returned here aliases internal state.
+
+    Each kind is its own lock shard: ws_frames ingest never waits on an
+    export reading requests, and readers of one kind share the lock. No
+    method holds more than one shard at a time.
+
+    Views attached to a kind see every record as it is stored (after the
+    shard lock is released) and are told when a domain is cleared. Views
+    with an evict(key, domain, records) method also hear about retention.
+    """
+
+    def __init__(self, kinds):
+        self._locks  = {k: RWLock() for k in kinds}
+        self._parts  = {k: {} for k in kinds}   # kind → domain → _Partition
+        self._by_rid = {k: {} for k in kinds}   # kind → requestId → domain of latest
+        self._views  = {k: [] for k in kinds}   # kind → [view with extend / clear_domain]
+        self._time   = {k: [] for k in kinds}   # kind → sorted [(timestamp, domain, seq)]
+        self.evicted = {k: {"items": 0, "bytes": 0} for k in kinds}
+        # Counters for /stats and /domains, behind their own lock so polls
+        # never queue behind a shard writer.
+        self._stats_lock = threading.Lock()
+        self._counts     = {k: {} for k in kinds}  # kind → domain → [items, bytes, last_seen]
+        self._totals     = {k: [0, 0] for k in kinds}
+        self._registry   = []                      # every domain any kind holds, sorted
+
+    def attach(self, key, view):
+        """Feed `view` every `key` record stored from now on, plus those already held."""
+        self._views[key].append(view)
+        view.extend(key, self.items(key))
+
+    def kinds(self):
+        return list(self._parts)
+
+    def add(self, key, obj, size=0):
+        self.extend(key, (obj,), (size,))
+
+    def extend(self, key, objs, sizes=None):
+        """Insert a batch of records under one lock acquisition.
+
+        `sizes` are the records' encoded lengths, used by byte retention.
+        Records that are not dicts (or compact records) are skipped. If one
+        record still fails, those stored before it reach the timeline,
+        counters and views before the error propagates.
+        """
+        parts, rids = self._parts[key], self._by_rid[key]
+        make = COMPACT_KINDS.get(key)
+        pairs = [(make(o) if make and isinstance(o, dict) else o, size)
+                 for o, size in zip(objs, sizes or repeat(0))
+                 if isinstance(o, (dict, _CompactRecord))]
+        stored = []
+        delta  = {}                                # domain → [items, bytes, last_seen]
+        try:
+            with self._locks[key].write():
+                timeline, entries = self._time[key], []
+                try:
+                    for obj, size in pairs:
+                        domain = obj.get("domain") or "unknown"
+                        if type(domain) is not str:
+                            domain = "unknown"
+                        part = parts.get(domain)
+                        if part is None:
+                            part = parts[domain] = _Partition()
+                        entries.append((_ts(obj), domain, part.append(obj, size)))
+                        stored.append(obj)
+                        rid = obj.get("requestId")
+                        if rid and type(rid) in (str, int):
+                            rids[rid] = domain
+                        d = delta.get(domain)
+                        if d is None:
+                            d = delta[domain] = [0, 0, 0]
+                        d[0] += 1
+                        d[1] += size
+                        d[2] = max(d[2], _ts(obj))
+                finally:
+                    entries.sort()
+                    if timeline and entries and entries[0] < timeline[-1]:
+                        timeline.extend(entries)
+                        timeline.sort()            # two sorted runs: one merge pass
+                    else:
+                        timeline.extend(entries)
+                    self._count(key, delta)
+        finally:
+            for view in self._views[key]:
+                view.extend(key, stored)
+
+    # ── Reads ────────────────────────────────────────────────────────────────
+
+    def items(self, key, domain=None):
+        """All records of a kind for one domain (or every domain), arrival order."""
+        with self._locks[key].read():
+            if domain:
+                part = self._parts[key].get(domain)
+                return list(part.items) if part else []
+            return [o for p in self._parts[key].values() for o in p.items]
+
+    def dump(self, key):
+        """(items, sizes) for a whole kind, taken consistently for snapshots."""
+        with self._locks[key].read():
+            parts = self._parts[key].values()
+            return [o for p in parts for o in p.items], [n for p in parts for n in p.sizes]
+
+    def by_domain(self, key):
+        with self._locks[key].read():
+            return {d: list(p.items) for d, p in self._parts[key].items()}
+
+    def tail(self, key, domain, limit):
+        with self._locks[key].read():
+            part = self._parts[key].get(domain)
+            return part.items[-limit:] if part and limit > 0 else []
+
+    def latest(self, key, domain=None):
+        """Most recently captured record for a domain, or per domain if None."""
+        with self._locks[key].read():
+            if domain:
+                part = self._parts[key].get(domain)
+                return part.items[-1] if part and part.items else None
+            return {d: p.items[-1] for d, p in self._parts[key].items() if p.items}
+
+    def recent(self, key, limit, domain=None, since=None, until=None):
+        """Newest `limit` records by timestamp, within [since, until] when
+        given, returned oldest first. O(limit) whatever the store holds."""
+        if limit <= 0:
+            return []
+        with self._locks[key].read():
+            parts = self._parts[key]
+            if domain:
+                part = parts.get(domain)
+                if not part:
+                    return []
+                index = part.by_time
+                lo = bisect_left(index, (since,)) if since is not None else 0
+                hi = bisect_right(index, (until, float("inf"))) if until is not None else len(index)
+                return [part.get(seq) for _, seq in index[max(lo, hi - limit):hi]]
+            index = self._time[key]
+            lo = bisect_left(index, (since,)) if since is not None else 0
+            hi = bisect_right(index, (until, _LAST)) if until is not None else len(index)
+            out = []
+            for i in range(hi - 1, lo - 1, -1):    # skips entries evicted since the last compaction
+                obj = parts[index[i][1]].get(index[i][2])
+                if obj is not None:
+                    out.append(obj)
+                    if len(out) == limit:
+                        break
+            out.reverse()
+            return out
+
+    def newest(self, key, limit, domain=None, any_of=(), none_of=()):
+        """Newest `limit` records by timestamp carrying any of `any_of` (if
+        given) and none of `none_of`, newest first.
+
+        Flags are tested against each record's bitmask while walking the
+        timeline back from its end, so the cost is O(limit) plus whatever
+        is skipped. When `any_of` flags are rare enough that walking would
+        skip more than their postings hold, the postings are read instead.
+        """
+        if limit <= 0:
+            return []
+        want, skip = flag_mask(any_of), flag_mask(none_of)
+        if any_of and not want:
+            return []
+        with self._locks[key].read():
+            parts = self._parts[key]
+            if domain:
+                part  = parts.get(domain)
+                if not part:
+                    return []
+                scope = [(domain, part)]
+                size  = len(part.by_time)
+                walk  = ((domain, seq) for _, seq in reversed(part.by_time))
+            else:
+                scope = list(parts.items())
+                size  = len(self._time[key])
+                walk  = ((d, seq) for _, d, seq in reversed(self._time[key]))
+            if any_of:
+                posted = sum(len(p.by_flag.get(fl, ())) for _, p in scope for fl in any_of)
+                if posted * posted < limit * size:
+                    hits = sorted((_ts(p.get(seq)), d, seq) for d, p in scope
+                                  for seq in set().union(*(p.by_flag.get(fl, ()) for fl in any_of))
+                                  if seq >= p.base)
+                    walk = ((d, seq) for _, d, seq in reversed(hits))
+            out = []
+            for d, seq in walk:
+                obj = parts[d].get(seq)
+                if obj is None:
+                    continue
+                mask = record_mask(obj)
+                if (not want or mask & want) and not mask & skip:
+                    out.append(obj)
+                    if len(out) == limit:
+                        break
+            return out
+
+    def page(self, key, domain=None, cursor=None, limit=100, since=None, until=None):
+        """One page of records after `cursor` ({domain: last seq returned}).
+
+        Each domain is read in arrival order, so a client following the
+        cursor sees every record exactly once even when timestamps arrive
+        out of order; across domains pages are interleaved by timestamp.
+        Returns (records, next cursor, whether more are waiting).
+        """
+        pos = dict(cursor or {})
+        with self._locks[key].read():
+            doms = [domain] if domain else list(self._parts[key])
+            runs = []
+            for d in doms:
+                part = self._parts[key].get(d)
+                if part:
+                    runs.append([(_ts(o), d, seq, o) for seq, o in part.page(pos.get(d, -1), limit + 1, since, until)])
+        merged = list(islice(heapq.merge(*runs, key=lambda r: r[:3]), limit + 1))
+        picked = merged[:limit]
+        for _, d, seq, _ in picked:
+            pos[d] = max(pos.get(d, -1), seq)
+        return [r[3] for r in picked], pos, len(merged) > limit
+
+    def select(self, key, domain=None, flags=(), terms=(), since=None, until=None):
+        """Records passing the index constraints of _Partition.select, newest
+        first within each domain, as [(domain, iterator)]. The iterators read
+        SELECT_CHUNK records per read-lock hold, so callers filter outside
+        the lock and read no further than they need."""
+        with self._locks[key].read():
+            doms = [domain] if domain else list(self._parts[key])
+            sel  = []
+            for d in doms:
+                part = self._parts[key].get(d)
+                if part:
+                    sel.append((d, part, iter(part.select(flags, terms, since, until))))
+        return [(d, self._records(key, d, part, seqs)) for d, part, seqs in sel]
+
+    def _records(self, key, domain, part, seqs):
+        """Records for the descending `seqs` of one partition, up to the
+        first one evicted since."""
+        while True:
+            with self._locks[key].read():
+                if self._parts[key].get(domain) is not part:
+                    return                  # domain cleared meanwhile
+                base  = part.base
+                chunk = [part.items[seq - base] for seq in islice(seqs, SELECT_CHUNK) if seq >= base]
+            if not chunk:
+                return
+            yield from chunk
+
+    def flagged(self, key, flags, domain=None):
+        """Records carrying any of `flags`, grouped by domain."""
+        with self._locks[key].read():
+            doms = [domain] if domain else list(self._parts[key])
+            return {d: self._parts[key][d].flagged(flags)
+                    for d in doms if d in self._parts[key]}
+
+    def by_request_id(self, key, rid, domain=None):
+        """Latest record with this requestId, in `domain` or in any domain."""
+        with self._locks[key].read():
+            return self._rid_lookup(key, rid, domain)
+
+    def join(self, key, domain=None, kinds=("responses", "bodies")):
+        """[(record, *matches)] for each `key` record, joined on requestId.
+
+        Matches come from each of `kinds` (None where missing), looked up in
+        `domain` or, if None, in any domain. One lock round per kind, so a
+        join costs O(rows) however much else has been captured.
+        """
+        rows = self.items(key, domain)
+        rids = [r.get("requestId") for r in rows]
+        cols = []
+        for k in kinds:
+            with self._locks[k].read():
+                cols.append([self._rid_lookup(k, rid, domain) if rid else None for rid in rids])
+        return list(zip(rows, *cols))
+
+    def _rid_lookup(self, key, rid, domain):
+        d = domain or self._by_rid[key].get(rid)
+        part = self._parts[key].get(d) if d else None
+        seq = part.by_rid.get(rid) if part else None
+        return part.get(seq) if seq is not None else None
+
+    def count(self, key, domain=None):
+        with self._stats_lock:
+            if domain:
+                c = self._counts[key].get(domain)
+                return c[0] if c else 0
+            return self._totals[key][0]
+
+    def domains(self, key=None):
+        """Domains holding `key` (or any kind), in first-seen order."""
+        with self._stats_lock:
+            if key:
+                return list(self._counts[key])
+            seen = {}
+            for counts in self._counts.values():
+                seen.update(dict.fromkeys(counts))
+            return list(seen)
+
+    def sorted_domains(self):
+        with self._stats_lock:
+            return list(self._registry)
+
+    def stats(self):
+        """Per kind: total items and bytes, last-seen timestamp, and the same per domain."""
+        with self._stats_lock:
+            return {k: {"total":     self._totals[k][0],
+                        "bytes":     self._totals[k][1],
+                        "last_seen": max((c[2] for c in counts.values()), default=None),
+                        "domains":   list(counts),
+                        "by_domain": {d: {"items": c[0], "bytes": c[1], "last_seen": c[2]}
+                                      for d, c in counts.items()}}
+                    for k, counts in self._counts.items()}
+
+    def _count(self, key, delta):
+        """Apply {domain: [items, bytes, last_seen]} changes to the counters."""
+        with self._stats_lock:
+            counts, total = self._counts[key], self._totals[key]
+            for domain, (n, nbytes, ts) in delta.items():
+                c = counts.get(domain)
+                if c is None:
+                    c = counts[domain] = [0, 0, 0]
+                    if domain not in self._registry:
+                        insort(self._registry, domain)
+                c[0] += n
+                c[1] += nbytes
+                c[2] = max(c[2], ts)
+                total[0] += n
+                total[1] += nbytes
+
+    # ── Writes ───────────────────────────────────────────────────────────────
+
+    def enforce_retention(self, now_ms=None):
+        """Trim every partition to its RETENTION limits. One write lock per
+        partition, then one per trimmed kind to compact its timeline."""
+        now_ms = now_ms if now_ms is not None else time.time() * 1000
+        for key, parts in self._parts.items():
+            trimmed = False
+            for domain in list(parts):
+                limits = RETENTION_DOMAINS.get(domain, {}).get(key) or RETENTION.get(key)
+                if not limits:
+                    continue
+                with self._locks[key].write():
+                    part = parts.get(domain)
+                    n = part.overflow(limits, now_ms) if part else 0
+                    if not n:
+                        continue
+                    dropped, freed = part.evict(n)
+                    rids = self._by_rid[key]
+                    for obj in dropped:
+                        rid = obj.get("requestId")
+                        if rid and rids.get(rid) == domain and rid not in part.by_rid:
+                            del rids[rid]
+                    self.evicted[key]["items"] += n
+                    self.evicted[key]["bytes"] += freed
+                    self._count(key, {domain: (-n, -freed, 0)})
+                    trimmed = True
+                for view in self._views[key]:
+                    if hasattr(view, "evict"):
+                        view.evict(key, domain, dropped)
+            if trimmed:
+                with self._locks[key].write():
+                    self._time[key] = [e for e in self._time[key] if e[2] >= parts[e[1]].base]
+
+    def retention_stats(self):
+        evicted, held = {}, {}
+        for k, parts in self._parts.items():
+            with self._locks[k].read():
+                evicted[k] = dict(self.evicted[k])
+                held[k]    = {"items": sum(len(p.items) for p in parts.values()),
+                              "bytes": sum(p.nbytes for p in parts.values())}
+        return {
+            "limits":  {k: RETENTION.get(k) for k in self._parts},
+            "domains": RETENTION_DOMAINS,
+            "evicted": evicted,
+            "held":    held,
+        }
+
+    def clear_domain(self, domain):
+        for key, parts in self._parts.items():
+            with self._locks[key].write():
+                if parts.pop(domain, None) is None:
+                    continue
+                rids = self._by_rid[key]
+                for rid in [r for r, d in rids.items() if d == domain]:
+                    del rids[rid]
+                self._time[key] = [e for e in self._time[key] if e[1] != domain]
+                with self._stats_lock:
+                    c = self._counts[key].pop(domain, None)
+                    if c:
+                        self._totals[key][0] -= c[0]
+                        self._totals[key][1] -= c[1]
+            for view in self._views[key]:
+                view.clear_domain(domain)
+        with self._stats_lock:
+            if domain in self._registry and not any(domain in c for c in self._counts.values()):
+                self._registry.remove(domain)
+
+
+store = CaptureStore(CAPTURE_KINDS)
+
+def retention_worker():
+    while True:
+        time.sleep(RETENTION_INTERVAL)
+        try:
+            store.enforce_retention()
+        except Exception as e:
+            print(f"[API] Retention pass failed: {e}")
+
+MAX_LIVE      = 500
+SSE_KEEPALIVE = 15           # s of silence before /live sends a comment line
+
+
+class LiveFeed:
+    """Fixed-size ring of recent events, each tagged with a sequence number.
+
+    Sequence numbers only ever increase, so a reader resumes from the last
+    seq it saw and learns exactly how many events were overwritten while
+    it was away instead of silently skipping or repeating them.
+    """
+
+    def __init__(self, size):
+        self._buf  = [None] * size
+        self._size = size
+        self._next = 0                      # seq the next event will get
+        self._cond = threading.Condition()
+
+    def extend(self, objs):
+        with self._cond:
+            for obj in objs:
+                self._buf[self._next % self._size] = obj
+                self._next += 1
+            self._cond.notify_all()
+
+    @property
+    def next_seq(self):
+        return self._next
+
+    def since(self, seq):
+        """(events from `seq` on as [(seq, event)], next seq, count lost to wrap)."""
+        with self._cond:
+            start = max(seq, self._next - self._size, 0)
+            items = [(i, self._buf[i % self._size]) for i in range(start, self._next)]
+            return items, self._next, start - seq if seq < start else 0
+
+    def latest(self, limit):
+        with self._cond:
+            start = max(self._next - min(limit, self._size), 0)
+            return [self._buf[i % self._size] for i in range(start, self._next)]
+
+    def wait(self, seq, timeout):
+        """Block until an event with seq >= `seq` exists or `timeout` passes."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._next > seq, timeout)
+
+
+live_feed = LiveFeed(MAX_LIVE)
+
+# ── Ingest-time views ─────────────────────────────────────────────────────────
+#
+# State the query endpoints used to rebuild from every captured record on
+# each call, kept up to date as records are stored instead.
+
+class BearerTokens:
+    """Bearer tokens from request Authorization headers, per domain."""
+
+    def __init__(self):
+        self.lock       = threading.Lock()
+        self._by_domain = {}    # domain → token → entry, in first-seen order
+
+    def extend(self, key, objs):
+        with self.lock:
+            for obj in objs:
+                auth = header_value(obj, "authorization") or header_value(obj, "Authorization")
+                if not isinstance(auth, str) or not auth.lower().startswith("bearer "):
+                    continue
+                domain = obj.get("domain") or "unknown"
+                token  = auth[7:]
+                ts     = obj.get("timestamp")
+                toks   = self._by_domain.setdefault(domain, {})
+                entry  = toks.get(token)
+                if entry is None:
+                    toks[token] = {"domain": domain, "token": token, "url": obj.get("url"),
+                                   "timestamp": ts, "first_seen": ts, "last_seen": ts}
+                    continue
+                if self._beats(ts, entry["first_seen"], later=False):
+                    entry.update(url=obj.get("url"), timestamp=ts, first_seen=ts)
+                if self._beats(ts, entry["last_seen"], later=True):
+                    entry["last_seen"] = ts
+
+    def clear_domain(self, domain):
+        with self.lock:
+            self._by_domain.pop(domain, None)
+
+    @staticmethod
+    def _beats(ts, seen, later):
+        """Whether `ts` is a newer last (or older first) sighting than `seen`."""
+        if not isinstance(ts, (int, float)):
+            return False
+        return not isinstance(seen, (int, float)) or (ts > seen if later else ts < seen)
+
+    def tokens(self, domain=None):
+        """Each distinct token once. Without a domain, first_seen and last_seen
+        span every domain, and domain / url are those of the first sighting."""
+        with self.lock:
+            if domain:
+                return [dict(e) for e in self._by_domain.get(domain, {}).values()]
+            merged = {}
+            for toks in self._by_domain.values():
+                for token, e in toks.items():
+                    m = merged.get(token)
+                    if m is None:
+                        merged[token] = dict(e)
+                        continue
+                    if self._beats(e["first_seen"], m["first_seen"], later=False):
+                        m.update(domain=e["domain"], url=e["url"],
+                                 timestamp=e["timestamp"], first_seen=e["first_seen"])
+                    if self._beats(e["last_seen"], m["last_seen"], later=True):
+                        m["last_seen"] = e["last_seen"]
+            return list(merged.values())
+
+
+class CookieJar:
+    """Live cookies per domain, from cookies / cookies_changed / auth_cookie events.
+
+    Keyed by (name, cookie domain). The event with the newest timestamp
+    wins, whatever order the files are replayed in: a later event replaces
+    the value (keeping attributes it does not mention) and `removed`
+    deletes the cookie until something newer sets it again.
+    """
+
+    def __init__(self):
+        self.lock     = threading.Lock()
+        self._jars    = {}      # domain → (name, cookie domain) → (ts, seq, cookie)
+        self._removed = {}      # (name, cookie domain) → ts of the newest removal
+        self._seq     = 0
+
+    def extend(self, key, objs):
+        with self.lock:
+            for evt in objs:
+                domain = evt.get("domain")
+                ts     = evt.get("timestamp")
+                ts     = ts if isinstance(ts, (int, float)) else 0
+                if evt.get("cookie"):
+                    self._set(domain, evt["cookie"], ts, evt.get("removed", False))
+                listed = evt.get("cookies")
+                if isinstance(listed, list):         # get_cookies / bulk capture
+                    for c in listed:
+                        self._set(domain, c, ts, False)
+
+    def _set(self, domain, c, ts, removed):
+        if not isinstance(c, dict):
+            return
+        k = (c.get("name"), c.get("domain"))
+        self._seq += 1
+        if removed:
+            if ts >= self._removed.get(k, ts):
+                self._removed[k] = ts
+            for jar in self._jars.values():
+                if k in jar and jar[k][0] <= ts:
+                    del jar[k]
+            return
+        if self._removed.get(k, -1) > ts:
+            return                          # stale: removed after this was set
+        domain = domain or (c.get("domain") or "").lstrip(".") or "unknown"
+        jar    = self._jars.setdefault(domain, {})
+        old    = jar.get(k)
+        if old is None:
+            jar[k] = (ts, self._seq, dict(c))
+        elif ts >= old[0]:
+            jar[k] = (ts, self._seq, {**old[2], **c})
+        else:
+            jar[k] = old[:2] + ({**c, **old[2]},)
+
+    def clear_domain(self, domain):
+        with self.lock:
+            self._jars.pop(domain, None)
+
+    def cookies(self, domain=None):
+        """Current cookies for `domain`, or the newest copy of each across all
+        domains, oldest-set first."""
+        with self.lock:
+            if domain:
+                entries = self._jars.get(domain, {}).values()
+            else:
+                best = {}
+                for jar in self._jars.values():
+                    for k, e in jar.items():
+                        if k not in best or e[:2] > best[k][:2]:
+                            best[k] = e
+                entries = best.values()
+            return [dict(c) for _, _, c in sorted(entries, key=lambda e: e[:2])]
+
+
+class StorageState:
+    """localStorage / sessionStorage per domain, merged as storage snapshots arrive.
+
+    `version` counts the snapshots that changed anything, so a poller can
+    tell whether the state moved since it last looked.
+    """
+
+    def __init__(self):
+        self.lock     = threading.Lock()
+        self._domains = {}      # domain → {"localStorage", "sessionStorage", "version"}
 
-live_feed      = []
-live_feed_lock = threading.Lock()
-MAX_LIVE       = 500
+    def extend(self, key, objs):
+        with self.lock:
+            for evt in objs:
+                data = evt.get("data", {})
+                if not isinstance(data, dict):
+                    continue
+                st = self._domains.setdefault(evt.get("domain") or "unknown",
+                                              {"localStorage": {}, "sessionStorage": {}, "version": 0})
+                changed = False
+                for area in ("localStorage", "sessionStorage"):
+                    kv, cur = data.get(area, {}), st[area]
+                    if kv and any(k not in cur or cur[k] != v for k, v in kv.items()):
+                        st[area].update(kv)
+                        changed = True
+                if changed:
+                    st["version"] += 1
+
+    def clear_domain(self, domain):
+        with self.lock:
+            self._domains.pop(domain, None)
+
+    def get(self, domain=None):
+        """{domain: state} for domains with any keys, or one domain's state ({} if none)."""
+        with self.lock:
+            out = {d: {"localStorage": dict(st["localStorage"]),
+                       "sessionStorage": dict(st["sessionStorage"]),
+                       "version": st["version"]}
+                   for d, st in self._domains.items()
+                   if (not domain or d == domain) and (st["localStorage"] or st["sessionStorage"])}
+        return out.get(domain, {}) if domain else out
+
+
+ENDPOINT_FLAGS = ("API", "AUTH_FLOW")
+
+_ID_SEGMENT = re.compile(
+    r"\d+|[0-9a-fA-F]{8}(-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}|[0-9a-fA-F]{16,}"
+    r"|(?=[\w-]*\d)[\w-]{20,}")      # numbers, UUIDs, hashes, long opaque tokens
+
+SELECTOR_PARAMS = ("action", "method", "op", "operation", "operationName", "cmd", "command", "fn")
+
+def url_template(url):
+    """`url` with id-like path segments replaced by {id} and its query cut
+    to the sorted parameter names. Selector parameters (SELECTOR_PARAMS),
+    which pick the endpoint on RPC-style APIs, keep their value."""
+    p    = urlparse(url or "")
+    path = "/".join("{id}" if _ID_SEGMENT.fullmatch(seg) else seg for seg in p.path.split("/"))
+    tmpl = f"{p.scheme}://{p.netloc}{path}" if p.netloc else path
+    if p.query:
+        params = dict(parse_qsl(p.query, keep_blank_values=True))
+        tmpl  += "?" + "&".join(f"{k}={params[k]}" if k in SELECTOR_PARAMS and not _ID_SEGMENT.fullmatch(params[k])
+                                else f"{k}=…" for k in sorted(params))
+    return tmpl
+
+
+class EndpointCatalog:
+    """API endpoints per domain, clustered by URL template.
+
+    Fed API / AUTH_FLOW requests (hits, methods, first/last seen, latest
+    request as the sample) and responses (status distribution). An entry's
+    method, url, flags, postData, timestamp and requestId are its sample's.
+    """
+
+    def __init__(self):
+        self.lock     = threading.Lock()
+        self._domains = {}      # domain → template → entry, in first-seen order
+
+    def extend(self, key, objs):
+        mask = flag_mask(ENDPOINT_FLAGS)
+        with self.lock:
+            for obj in objs:
+                if key == "responses":
+                    self._response(obj)
+                    continue
+                if isinstance(obj, _CompactRecord):
+                    if not obj.mask & mask:
+                        continue
+                elif not any(f in ENDPOINT_FLAGS for f in obj.get("flags") or ()):
+                    continue
+                domain = obj.get("domain") or "unknown"
+                tmpl   = url_template(obj.get("url"))
+                ts     = obj.get("timestamp")
+                method = obj.get("method")
+                eps    = self._domains.setdefault(domain, {})
+                e      = eps.get(tmpl)
+                if e is None:
+                    e = eps[tmpl] = {"template": tmpl, "methods": {}, "hits": 0,
+                                     "first_seen": ts, "last_seen": ts, "statuses": {}}
+                e["methods"][method] = e["methods"].get(method, 0) + 1
+                e["hits"] += 1
+                if ts is not None:
+                    e["last_seen"] = ts
+                    if e["first_seen"] is None:
+                        e["first_seen"] = ts
+                e.update(method=method, url=obj.get("url"), flags=obj.get("flags", []),
+                         postData=obj.get("postData"), timestamp=ts, requestId=obj.get("requestId"))
+
+    def _response(self, obj):
+        e = self._domains.get(obj.get("domain") or "unknown", {}).get(url_template(obj.get("url")))
+        if e is not None and obj.get("status") is not None:
+            st = str(obj.get("status"))
+            e["statuses"][st] = e["statuses"].get(st, 0) + 1
+
+    def clear_domain(self, domain):
+        with self.lock:
+            self._domains.pop(domain, None)
+
+    def endpoints(self, domain=None):
+        """{domain: [entry]} for one domain or all, entries in first-seen order."""
+        with self.lock:
+            return {d: [dict(e, methods=dict(e["methods"]), statuses=dict(e["statuses"]))
+                        for e in eps.values()]
+                    for d, eps in self._domains.items() if eps and (not domain or d == domain)}
+
+
+HEADER_VALUES = 5             # distinct recent values kept per header
+
+
+class HeaderIndex:
+    """Most recent values of every header, per kind and domain.
+
+    Names are lower-cased. Each keeps its HEADER_VALUES newest distinct
+    values with first/last seen and a count, so finding one header is a
+    dict lookup instead of a scan over recent requests.
+    """
+
+    def __init__(self):
+        self.lock   = threading.Lock()
+        self._index = {}        # (kind, domain) → name → [[value, first_seen, last_seen, count]], newest first
+        self._lower = {}        # header-name tuple → the same names lower-cased
+
+    def extend(self, key, objs):
+        with self.lock:
+            for obj in objs:
+                names, values = header_items(obj)
+                if not names:
+                    continue
+                lower = self._lower.get(names)
+                if lower is None:
+                    lower = self._lower[names] = tuple(str(n).lower() for n in names)
+                idx = self._index.setdefault((key, obj.get("domain") or "unknown"), {})
+                ts  = obj.get("timestamp")
+                for name, value in zip(lower, values):
+                    vals = idx.get(name)
+                    if vals is None:
+                        idx[name] = [[value, ts, ts, 1]]
+                    elif vals[0][0] == value:
+                        vals[0][2] = ts
+                        vals[0][3] += 1
+                    else:
+                        for i in range(1, len(vals)):
+                            if vals[i][0] == value:
+                                e = vals.pop(i)
+                                e[2] = ts
+                                e[3] += 1
+                                vals.insert(0, e)
+                                break
+                        else:
+                            vals.insert(0, [value, ts, ts, 1])
+                            del vals[HEADER_VALUES:]
+
+    def clear_domain(self, domain):
+        with self.lock:
+            for k in [k for k in self._index if k[1] == domain]:
+                del self._index[k]
+
+    def latest(self, kind, domain=None, name=None):
+        """Latest value of `name` in `domain` (or whichever domain saw it last),
+        or {name: {value, timestamp}} for every header of `domain`."""
+        with self.lock:
+            if name is None:
+                return {n: {"value": v[0][0], "timestamp": v[0][2]}
+                        for n, v in self._index.get((kind, domain), {}).items()}
+            name, best, best_ts = name.lower(), None, None
+            for (k, d), idx in self._index.items():
+                vals = idx.get(name) if k == kind and (not domain or d == domain) else None
+                ts   = vals[0][2] if vals and isinstance(vals[0][2], (int, float)) else 0
+                if vals and (best is None or ts > best_ts):
+                    best, best_ts = (d, vals), ts
+            if best is None:
+                return {"domain": domain, "name": name, "value": None, "timestamp": None, "values": []}
+            d, vals = best
+            return {"domain": d, "name": name, "value": vals[0][0], "timestamp": vals[0][2],
+                    "values": [{"value": v, "first_seen": f, "last_seen": l, "count": c}
+                               for v, f, l, c in vals]}
+
+
+class _FrameAgg:
+    """Running totals over a stream of WS frames."""
+    __slots__ = ("frames", "recv", "sent", "flags", "values")
+
+    def __init__(self):
+        self.frames = self.recv = self.sent = 0
+        self.flags  = {}        # flag → frames carrying it
+        self.values = {}        # extracted key → [count, min, max, sum, last, last timestamp]
+
+    def add(self, obj, flags, extracted, ts):
+        self.frames += 1
+        direction = obj.get("direction")
+        if direction == "recv":
+            self.recv += 1
+        elif direction == "sent":
+            self.sent += 1
+        for fl in flags:
+            self.flags[fl] = self.flags.get(fl, 0) + 1
+        for k, v in extracted:
+            s = self.values.get(k)
+            if s is None:
+                self.values[k] = [1, v, v, v, v, ts]
+                continue
+            s[0] += 1
+            if v < s[1]:
+                s[1] = v
+            if v > s[2]:
+                s[2] = v
+            s[3] += v
+            if ts >= s[5]:
+                s[4], s[5] = v, ts
+
+    def merge(self, other):
+        self.frames += other.frames
+        self.recv   += other.recv
+        self.sent   += other.sent
+        for fl, n in other.flags.items():
+            self.flags[fl] = self.flags.get(fl, 0) + n
+        for k, o in other.values.items():
+            s = self.values.get(k)
+            if s is None:
+                self.values[k] = list(o)
+                continue
+            s[0] += o[0]
+            s[1]  = min(s[1], o[1])
+            s[2]  = max(s[2], o[2])
+            s[3] += o[3]
+            if o[5] >= s[5]:
+                s[4], s[5] = o[4], o[5]
+
+    def summary(self):
+        return {
+            "frames": {"total": self.frames, "recv": self.recv, "sent": self.sent},
+            "flags":  dict(self.flags),
+            "extractedValues": {k: {"count": c, "min": lo, "max": hi,
+                                    "avg": round(total / c, 4), "last": last}
+                                for k, (c, lo, hi, total, last, _) in self.values.items()},
+        }
+
+
+class WsStats:
+    """Frame counts, flag counts and running min/max/mean/last of every
+    numeric `extracted` key, per domain and per connection (requestId).
+
+    Updated as frames arrive, so /ws/stats costs O(keys) however long the
+    socket has been open. Totals cover every frame ingested since start,
+    including frames retention has since evicted.
+    """
+
+    def __init__(self):
+        self.lock     = threading.Lock()
+        self._domains = {}      # domain → _FrameAgg
+        self._conns   = {}      # domain → requestId → _FrameAgg
+
+    def extend(self, key, objs):
+        with self.lock:
+            for obj in objs:
+                domain = obj.get("domain") or "unknown"
+                rid    = obj.get("requestId") or obj.get("request_id", "unknown")
+                ts     = _ts(obj)
+                flags  = obj.get("flags") or ()
+                ex     = obj.get("extracted")
+                ex     = [(k, v) for k, v in ex.items() if type(v) in (int, float)] \
+                         if isinstance(ex, dict) else ()
+                agg = self._domains.get(domain)
+                if agg is None:
+                    agg = self._domains[domain] = _FrameAgg()
+                agg.add(obj, flags, ex, ts)
+                conns = self._conns.setdefault(domain, {})
+                agg = conns.get(rid)
+                if agg is None:
+                    agg = conns[rid] = _FrameAgg()
+                agg.add(obj, flags, ex, ts)
+
+    def clear_domain(self, domain):
+        with self.lock:
+            self._domains.pop(domain, None)
+            self._conns.pop(domain, None)
+
+    def summary(self, domain=None, rid=None):
+        """Aggregates for one connection, one domain, or everything."""
+        with self.lock:
+            if rid:
+                aggs = [c[rid] for d, c in self._conns.items() if rid in c and (not domain or d == domain)]
+            elif domain:
+                aggs = [self._domains[domain]] if domain in self._domains else []
+            else:
+                aggs = list(self._domains.values())
+            total = _FrameAgg()
+            for agg in aggs:
+                total.merge(agg)
+            return total.summary()
+
+
+class WsConnections:
+    """WebSocket connections by requestId, built from websocket_opened /
+    _handshake / _closed events, with frame count, payload bytes and last
+    frame time per connection taken from ws_frames.
+    """
+
+    def __init__(self):
+        self.lock    = threading.Lock()
+        self._conns  = {}       # requestId → summary, in first-seen order
+        self._open   = {}       # requestId → None, for the ones still open
+        self._frames = {}       # requestId → [frames, bytes, last frame timestamp, domain]
+
+    def extend(self, key, objs):
+        with self.lock:
+            for ev in objs:
+                rid = ev.get("requestId") or ev.get("request_id", "unknown")
+                if key == "ws_frames":
+                    payload = ev.get("payload")
+                    size = len(payload.encode("utf-8", "replace")) if isinstance(payload, str) else 0
+                    f = self._frames.get(rid)
+                    if f is None:
+                        f = self._frames[rid] = [0, 0, None, ev.get("domain") or "unknown"]
+                    f[0] += 1
+                    f[1] += size
+                    ts = ev.get("timestamp")
+                    if ts is not None and (f[2] is None or ts >= f[2]):
+                        f[2] = ts
+                    continue
+                c = self._conns.get(rid)
+                if c is None:
+                    c = self._conns[rid] = {
+                        "requestId": rid,
+                        "url":       ev.get("url", ""),
+                        "domain":    ev.get("domain", ""),
+                        "tabId":     ev.get("tabId"),
+                        "openedAt":  None,
+                        "closedAt":  None,
+                        "handshake": None,
+                        "open":      True,
+                        "summary":   None,
+                    }
+                    self._open[rid] = None
+                t = ev.get("type", "")
+                if t == "websocket_opened":
+                    c["openedAt"] = ev.get("timestamp")
+                    c["url"]      = ev.get("url", c["url"])
+                elif t == "websocket_handshake":
+                    c["handshake"] = {
+                        "status":  ev.get("status"),
+                        "headers": ev.get("headers", {}),
+                    }
+                elif t == "websocket_closed":
+                    c["closedAt"] = ev.get("timestamp")
+                    c["open"]     = False
+                    c["summary"]  = ev.get("summary")
+                    self._open.pop(rid, None)
+
+    def clear_domain(self, domain):
+        with self.lock:
+            for rid in [r for r, c in self._conns.items() if c["domain"] == domain]:
+                del self._conns[rid]
+                self._open.pop(rid, None)
+            for rid in [r for r, f in self._frames.items() if f[3] == domain]:
+                del self._frames[rid]
+
+    def connections(self, domain=None, open_only=False):
+        """Connection summaries, newest opened first."""
+        with self.lock:
+            rids = self._open if open_only else self._conns
+            out  = []
+            for rid in rids:
+                c = self._conns[rid]
+                if domain and c["domain"] != domain:
+                    continue
+                n, nbytes, last, _ = self._frames.get(rid) or (0, 0, None, None)
+                out.append(dict(c, frames=n, bytes=nbytes, lastFrameAt=last))
+        out.sort(key=lambda x: x.get("openedAt") or 0, reverse=True)
+        return out
+
+
+SERIES_POINTS = 200_000       # points kept per (domain, extracted key); oldest go first
+_BUCKET       = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)?")
+_BUCKET_MS    = {"ms": 1, "s": 1000, "m": 60_000, "h": 3_600_000}
+
+def parse_bucket(text):
+    """Whole-ms bucket width from "500ms", "1s", "5m", "1h" (bare numbers are seconds)."""
+    m = _BUCKET.fullmatch(text.strip())
+    width = float(m.group(1)) * _BUCKET_MS[m.group(2) or "s"] if m else 0
+    if width < 1:
+        raise ValueError(f"bad bucket: {text!r}")
+    return int(width)
+
+
+class WsSeries:
+    """Numeric `extracted` values of WS frames as columnar time series.
+
+    One pair of arrays (timestamps, values) per domain and key, kept in
+    timestamp order, so a window is two bisects and bucketing touches only
+    the points inside it.
+    """
+
+    def __init__(self):
+        self.lock    = threading.Lock()
+        self._series = {}       # domain → key → (array of timestamps, array of values)
+
+    def extend(self, key, objs):
+        with self.lock:
+            for obj in objs:
+                ex = obj.get("extracted")
+                ts = obj.get("timestamp")
+                if not ex or not isinstance(ex, dict) or type(ts) not in (int, float):
+                    continue
+                series = self._series.setdefault(obj.get("domain") or "unknown", {})
+                for k, v in ex.items():
+                    if type(v) not in (int, float):
+                        continue
+                    col = series.get(k)
+                    if col is None:
+                        col = series[k] = (array("d"), array("d"))
+                    times, values = col
+                    if not times or ts >= times[-1]:
+                        times.append(ts)
+                        values.append(v)
+                    else:
+                        i = bisect_right(times, ts)
+                        times.insert(i, ts)
+                        values.insert(i, v)
+                    if len(times) > SERIES_POINTS + SERIES_POINTS // 10:
+                        del times[:-SERIES_POINTS], values[:-SERIES_POINTS]
+
+    def clear_domain(self, domain):
+        with self.lock:
+            self._series.pop(domain, None)
+
+    def keys(self, domain=None):
+        """{key: points held} for one domain or summed over all."""
+        with self.lock:
+            out = {}
+            for d, series in self._series.items():
+                if not domain or d == domain:
+                    for k, (times, _) in series.items():
+                        out[k] = out.get(k, 0) + len(times)
+            return out
+
+    def buckets(self, key, width, domain=None, since=None, until=None):
+        """Non-empty buckets of `width` ms as {t, open, high, low, close, count, mean}."""
+        with self.lock:
+            cols = [s[key] for d, s in self._series.items()
+                    if key in s and (not domain or d == domain)]
+            runs = []
+            for times, values in cols:
+                lo = bisect_left(times, since) if since is not None else 0
+                hi = bisect_right(times, until) if until is not None else len(times)
+                runs.append(zip(times[lo:hi], values[lo:hi]))
+        out, cur, total = [], None, 0.0
+        for ts, v in heapq.merge(*runs, key=lambda p: p[0]):
+            t = ts // width * width
+            if cur is None or t != cur["t"]:
+                if cur is not None:
+                    cur["mean"] = round(total / cur["count"], 4)
+                cur, total = {"t": int(t), "open": v, "high": v, "low": v,
+                              "close": v, "count": 0, "mean": None}, 0.0
+                out.append(cur)
+            cur["high"]   = max(cur["high"], v)
+            cur["low"]    = min(cur["low"], v)
+            cur["close"]  = v
+            cur["count"] += 1
+            total        += v
+        if cur is not None:
+            cur["mean"] = round(total / cur["count"], 4)
+        return out
+
+
+SEARCH_POSTDATA = True          # also index request postData, not just response bodies
+SEARCH_MAX_TEXT = 1 << 20       # characters of one body that get indexed
+SEARCH_LIMIT    = 20
+SEARCH_INTERVAL = 1             # s between background indexing passes
+SEARCH_CHUNK    = 500           # docs tokenized per pass, outside the index lock
+SEARCH_BUCKETS  = 1 << 18       # hashed vocabulary size (a power of two)
+_WORD           = re.compile(r"\w{2,64}")
+
+
+class SearchIndex:
+    """Inverted index over response bodies (and request postData).
+
+    Records are queued as they arrive and tokenized by search_worker, in
+    SEARCH_CHUNK slices read outside the lock, so ingest and snapshot
+    restores only pay for a list append. Searches never wait for that
+    backlog: they cover what is indexed and report how much is pending.
+
+    Captures are mostly one-off ids, prices and tokens, so the vocabulary
+    is not kept: each word hashes into one of SEARCH_BUCKETS slots, whose
+    postings are an array('Q') of doc << 8 | term frequency (a bare int
+    while there is only one). Memory is the fixed table plus 8 bytes per
+    (doc, word). Words sharing a slot can produce false hits, so every
+    result is confirmed against its text before it is returned.
+
+    Evicted or cleared docs are dropped from results at once and from the
+    postings when they outnumber the live ones. Matching is on whole
+    words, all of them required; results are ranked by BM25.
+    """
+
+    def __init__(self):
+        self.lock     = threading.Lock()
+        self._docs    = []          # doc → [record, kind, length in words] or None once gone
+        self._doc_of  = {}          # id(record) → doc, while the record is held
+        self._pending = deque()     # docs not tokenized yet
+        self._busy    = 0           # docs taken off _pending and being tokenized
+        self._post    = [None] * SEARCH_BUCKETS   # slot → None, one posting, or array of them
+        self._live    = 0
+        self._words   = 0           # total length of live docs, for BM25
+        self._dead    = 0           # gone docs still in the postings
+
+    def extend(self, key, objs):
+        with self.lock:
+            for obj in objs:
+                if key == "requests" and not (SEARCH_POSTDATA and obj.get("postData")):
+                    continue
+                doc = len(self._docs)
+                self._docs.append([obj, key, None])
+                self._doc_of[id(obj)] = doc
+                self._pending.append(doc)
+
+    def evict(self, key, domain, objs):
+        with self.lock:
+            for obj in objs:
+                doc = self._doc_of.get(id(obj))
+                if doc is not None and self._docs[doc][0] is obj:
+                    self._drop(doc)
+
+    def clear_domain(self, domain):
+        with self.lock:
+            for doc, entry in enumerate(self._docs):
+                if entry and (entry[0].get("domain") or "unknown") == domain:
+                    self._drop(doc)
+
+    def _drop(self, doc):
+        obj, _, length = self._docs[doc]
+        self._docs[doc] = None
+        del self._doc_of[id(obj)]
+        if length is not None:
+            self._live  -= 1
+            self._words -= length
+            self._dead  += 1
+
+    def _text(self, entry):
+        obj, kind, _ = entry
+        if kind == "requests":
+            text = obj.get("postData")
+        elif obj.get("base64"):
+            return ""
+        else:
+            text = obj.get("body")
+        if not isinstance(text, str):
+            text = json.dumps(text) if text is not None else ""
+        return text[:SEARCH_MAX_TEXT]
+
+    @staticmethod
+    def _slot(word):
+        return hash(word) & (SEARCH_BUCKETS - 1)
+
+    def _postings(self, slot):
+        p = self._post[slot]
+        return () if p is None else (p,) if type(p) is int else p
+
+    def catch_up(self, n=SEARCH_CHUNK):
+        """Tokenize up to `n` queued docs; True if more are waiting.
+
+        The docs are read and tokenized without the lock held, so ingest
+        and searches only wait for the postings to be appended.
+        """
+        with self.lock:
+            batch = []
+            while self._pending and len(batch) < n:
+                doc = self._pending.popleft()
+                if self._docs[doc] is not None:
+                    batch.append((doc, self._docs[doc]))
+            more        = bool(self._pending)
+            self._busy += len(batch)
+        counted = []
+        for doc, entry in batch:
+            tf = {}
+            for w in _WORD.findall(self._text(entry).lower()):
+                tf[w] = tf.get(w, 0) + 1
+            counted.append((doc, entry, tf))
+        with self.lock:
+            self._busy -= len(batch)
+            post = self._post
+            for doc, entry, tf in counted:
+                if self._docs[doc] is not entry:
+                    continue                # evicted or cleared meanwhile
+                for w, c in tf.items():
+                    slot, p = self._slot(w), doc << 8 | min(c, 255)
+                    cur = post[slot]
+                    if cur is None:
+                        post[slot] = p
+                    elif type(cur) is int:
+                        post[slot] = array("Q", (cur, p))
+                    else:
+                        cur.append(p)
+                entry[2] = sum(tf.values())
+                self._live  += 1
+                self._words += entry[2]
+            if self._dead > max(self._live, 1000):
+                self._compact()
+        return more
+
+    def _compact(self):
+        docs, post = self._docs, self._post
+        for slot, cur in enumerate(post):
+            if cur is None:
+                continue
+            kept = [p for p in ((cur,) if type(cur) is int else cur) if docs[p >> 8] is not None]
+            post[slot] = None if not kept else kept[0] if len(kept) == 1 else array("Q", kept)
+        self._dead = 0
+
+    def search(self, q, domain=None, limit=SEARCH_LIMIT):
+        """{"results": best `limit` indexed docs holding every word of `q`,
+        "pending": docs queued but not yet searchable}."""
+        words = list(dict.fromkeys(_WORD.findall(q.lower())))
+        with self.lock:
+            pending = len(self._pending) + self._busy
+            lists   = [self._postings(s) for s in dict.fromkeys(self._slot(w) for w in words)]
+            if not words or limit <= 0 or not all(lists):
+                return {"results": [], "pending": pending}
+            docs, n = self._docs, max(self._live, 1)
+            avg     = self._words / n or 1
+            lists.sort(key=len)
+            scores  = {}
+            for rank, plist in enumerate(lists):
+                idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+                hit = {}
+                for p in plist:
+                    doc = p >> 8
+                    if (rank == 0 or doc in scores) and docs[doc] is not None:
+                        entry, tf = docs[doc], p & 255
+                        if rank == 0 and domain and (entry[0].get("domain") or "unknown") != domain:
+                            continue
+                        # BM25 with k1 = 1.2, b = 0.75
+                        hit[doc] = scores.get(doc, 0) + idf * tf * 2.2 / (tf + 1.2 * (0.25 + 0.75 * entry[2] / avg))
+                scores = hit
+            ranked = [(-score, doc, docs[doc]) for doc, score in scores.items()]
+        heapq.heapify(ranked)
+        pats = [re.compile(r"\b%s\b" % re.escape(w), re.I) for w in words]
+        out  = []
+        while ranked and len(out) < limit:
+            score, _, entry = heapq.heappop(ranked)
+            res = self._result(entry, -score, pats)
+            if res is not None:
+                out.append(res)
+        return {"results": out, "pending": pending}
+
+    def _result(self, entry, score, pats):
+        """Result dict for a candidate, or None if a word hit was a slot collision."""
+        obj, kind, _ = entry
+        text  = self._text(entry)
+        found = [p.search(text) for p in pats]
+        if not all(found):
+            return None
+        at    = min(m.start() for m in found)
+        start = max(0, at - 60)
+        return {"requestId": obj.get("requestId"), "url": obj.get("url"),
+                "domain": obj.get("domain"), "kind": kind,
+                "timestamp": obj.get("timestamp"), "score": round(score, 3),
+                "snippet": ("…" if start else "") + " ".join(text[start:at + 120].split())}
+
+
+bearer_tokens    = BearerTokens()
+cookie_jar       = CookieJar()
+storage_state    = StorageState()
+endpoint_catalog = EndpointCatalog()
+header_index     = HeaderIndex()
+search_index     = SearchIndex()
+ws_stats         = WsStats()
+ws_connections   = WsConnections()
+ws_series        = WsSeries()
+store.attach("requests",       bearer_tokens)
+store.attach("requests",       endpoint_catalog)
+store.attach("responses",      endpoint_catalog)
+store.attach("requests",       header_index)
+store.attach("responses",      header_index)
+store.attach("cookies",        cookie_jar)
+store.attach("auth",           cookie_jar)
+store.attach("storage",        storage_state)
+store.attach("ws_frames",      ws_stats)
+store.attach("ws_frames",      ws_connections)
+store.attach("ws_connections", ws_connections)
+store.attach("ws_frames",      ws_series)
+store.attach("bodies",         search_index)
+store.attach("requests",       search_index)
+
+def search_worker():
+    while True:
+        time.sleep(SEARCH_INTERVAL)
+        try:
+            while search_index.catch_up():
+                pass
+        except Exception as e:
+            print(f"[API] Search indexing failed: {e}")
 
 
 # ── URL Queue ─────────────────────────────────────────────────────────────────
@@ -124,60 +1958,504 @@ FILE_TO_KEY = {
     "fingerprints.jsonl":   "fingerprints",
 }
 
+# ── Capture segments ──────────────────────────────────────────────────────────
+#
+# The C host only ever appends to `<kind>.jsonl`. Once the watcher has read a
+# file past SEGMENT_BYTES it renames it to `<kind>.000001.jsonl` (the host's
+# next fopen("a") starts a fresh file) and a background thread gzips the
+# sealed segment. Startup reads the segments in order, then the live file.
+#
+# Rolling renames a file the host (and our tail) still hold open, which only
+# POSIX allows; on Windows it is off and files grow as before.
+
+SEGMENT_BYTES    = 64 << 20 if os.name == "posix" else None  # roll past this size; None = never
+SEGMENT_COMPRESS = True      # gzip sealed segments in the background
+SEGMENT_KEEP     = None      # sealed segments kept per file; None = keep all
+SEAL_RETRY       = 60        # s before retrying a seal that failed
+
+segments       = {}          # fname → sealed segment numbers, ascending
+_compress_jobs = queue.Queue()
+
+def _segment_path(fname, n, gz=False):
+    return DATA_DIR / f"{fname[:-len('.jsonl')]}.{n:06d}.jsonl{'.gz' if gz else ''}"
+
+def list_segments(fname):
+    """[(number, path)] of the sealed segments of `fname`, oldest first."""
+    pat   = re.compile(re.escape(fname[:-len(".jsonl")]) + r"\.(\d+)\.jsonl(\.gz)?$")
+    found = {}
+    for p in DATA_DIR.glob(fname[:-len(".jsonl")] + ".*.jsonl*"):
+        m = pat.match(p.name)
+        if m and (m.group(2) or int(m.group(1)) not in found):
+            found[int(m.group(1))] = p      # a finished .gz wins over its leftover source
+    return sorted(found.items())
+
+def seal_segment(tail):
+    """Rename the live file behind `tail` to the next segment. False if it cannot be moved."""
+    nums = segments.setdefault(tail.fname, [])
+    n    = (nums[-1] if nums else 0) + 1
+    seg  = _segment_path(tail.fname, n)
+    try:
+        os.rename(tail.path, seg)
+    except OSError as e:
+        print(f"[API] Cannot seal {tail.fname}: {e} (retrying in {SEAL_RETRY}s)")
+        tail.seal_after = time.time() + SEAL_RETRY
+        return False
+    nums.append(n)
+    _BodySource.moved(tail.path, seg, tail.ino)
+    print(f"[API] Sealed {tail.fname} → {seg.name}")
+    if SEGMENT_COMPRESS:
+        _compress_jobs.put(seg)
+    _prune_segments(tail.fname)
+    return True
+
+def _prune_segments(fname):
+    nums = segments.get(fname, [])
+    while SEGMENT_KEEP is not None and len(nums) > SEGMENT_KEEP:
+        n = nums.pop(0)
+        for p in (_segment_path(fname, n), _segment_path(fname, n, gz=True)):
+            try:
+                os.unlink(p)
+            except OSError:
+                pass
+
+def _compress_segment(path):
+    gz  = path.with_name(path.name + ".gz")
+    tmp = gz.with_name(gz.name + ".tmp")
+    with open(path, "rb") as src, gzip.open(tmp, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    os.replace(tmp, gz)
+    _BodySource.moved(path, gz)
+    try:
+        os.unlink(path)
+    except OSError as e:                # still open somewhere; list_segments prefers the .gz
+        print(f"[API] Cannot remove {path.name}: {e}")
+    return gz
+
+def compress_worker():
+    while True:
+        path = _compress_jobs.get()
+        try:
+            if path.exists():
+                before = path.stat().st_size
+                gz     = _compress_segment(path)
+                print(f"[API] Compressed {path.name}: {before >> 10} → {gz.stat().st_size >> 10} KiB")
+        except Exception as e:
+            print(f"[API] Compress {path.name} failed: {e}")
+
 # ── Load existing data ────────────────────────────────────────────────────────
+#
+# Startup parses only what the last snapshot does not already cover. The
+# snapshot pickles each kind's records together with the sealed segments
+# they include and the byte offset (and inode / leading bytes) reached in
+# the live file. If that file has since been sealed, parsing resumes at the
+# same offset inside its segment; a file rewritten in place is parsed again
+# from the start. Large loads are split into newline-aligned chunks and
+# decoded across a process pool.
+
+file_positions = {}          # fname → byte offset of the last complete line read
+
+SNAPSHOT_PATH     = DATA_DIR / "store.snapshot"
+SNAPSHOT_VERSION  = 5
+SNAPSHOT_INTERVAL = 300      # s between background snapshots while ingesting
+LOAD_CHUNK        = 16 << 20
+LOAD_PARALLEL_MIN = 8 << 20  # below this a process pool costs more than it saves
+LOAD_AHEAD        = 2 * (os.cpu_count() or 1)  # decoded chunks in flight at once
+
+snapshot_lock = threading.Lock()
+
+def _open_capture(path):
+    return gzip.open(path, "rb") if str(path).endswith(".gz") else open(path, "rb")
+
+def _file_head(path, n=256):
+    with _open_capture(path) as f:
+        return f.read(n)
+
+def _complete_end(path, size):
+    """Offset just past the last newline; a partial last line is left to the watcher."""
+    with open(path, "rb") as f:
+        pos = size
+        while pos > 0:
+            step = min(64 * 1024, pos)
+            f.seek(pos - step)
+            i = f.read(step).rfind(b"\n")
+            if i >= 0:
+                return pos - step + i + 1
+            pos -= step
+    return 0
+
+def _split_ranges(path, start, end):
+    """Cut [start, end) into ~LOAD_CHUNK pieces that each end on a newline."""
+    ranges = []
+    with open(path, "rb") as f:
+        while start < end:
+            stop = min(start + LOAD_CHUNK, end)
+            if stop < end:
+                f.seek(stop)
+                f.readline()
+                stop = min(f.tell(), end)
+            ranges.append((start, stop))
+            start = stop
+    return ranges
+
+def _decode_chunk(data, base=0):
+    """Decode the newline-separated JSON in `data`, which starts at file offset `base`.
+
+    Returns (records, line lengths, line offsets, undecodable count). Lines
+    that decode to anything but an object count as undecodable.
+    """
+    objs, sizes, offsets, errors = [], [], [], 0
+    pos = base
+    for line in data.split(b"\n"):
+        n = len(line)
+        if n and not line.isspace():
+            try:
+                obj = json.loads(line)
+            except Exception:
+                obj = None
+            if isinstance(obj, dict):
+                objs.append(obj)
+                sizes.append(n)
+                offsets.append(pos)
+            else:
+                errors += 1
+        pos += n + 1
+    return objs, sizes, offsets, errors
+
+def _parse_range(path, start, end, stubs=False):
+    """Decode the JSON lines in [start, end) of `path` (end None = to EOF). Runs in a worker process.
+
+    With `stubs`, records come back as _body_stubs, so body text is never
+    pickled back to the parent: BodyRecords only need metadata and offsets.
+    """
+    with _open_capture(path) as f:
+        f.seek(start)
+        objs, sizes, offsets, errors = _decode_chunk(f.read() if end is None else f.read(end - start), start)
+    return (_body_stubs(objs) if stubs else objs), sizes, offsets, errors
+
+def _file_jobs(path, start):
+    """(path, start, end) jobs covering `path` from `start`, and the offset they reach."""
+    if str(path).endswith(".gz"):
+        return [(str(path), start, None)], None
+    end = _complete_end(path, path.stat().st_size)
+    return [(str(path), a, b) for a, b in _split_ranges(path, start, end)], end
+
+def _parse_jobs(jobs, parallel):
+    """Yield the parsed chunk of each (path, start, end, stubs) job, in job order.
+
+    At most LOAD_AHEAD chunks are decoded ahead of the consumer, so startup
+    never holds more than that many chunks' records at once.
+    """
+    done = 0
+    if parallel and len(jobs) > 1:
+        try:
+            with ProcessPoolExecutor() as pool:
+                ahead = deque()
+                for job in jobs:
+                    ahead.append(pool.submit(_parse_range, *job))
+                    if len(ahead) >= LOAD_AHEAD:
+                        yield ahead.popleft().result()
+                        done += 1
+                while ahead:
+                    yield ahead.popleft().result()
+                    done += 1
+        except Exception as e:
+            print(f"[API] Parallel load failed ({e}), loading sequentially")
+    for job in jobs[done:]:
+        yield _parse_range(*job)
+
+def _read_snapshot():
+    try:
+        with open(SNAPSHOT_PATH, "rb") as f:
+            snap = pickle.load(f)
+        if snap.get("version") == SNAPSHOT_VERSION:
+            return snap["files"]
+    except Exception:
+        pass
+    return {}
+
+def write_snapshot(checkpoints):
+    """Persist the store with each file's (inode, offset, sealed segments) checkpoint.
+
+    Must be called from the ingest thread so records and offsets agree; the
+    pickling itself runs on a background thread.
+    """
+    if not snapshot_lock.acquire(blocking=False):
+        return
+    files = {}
+    try:
+        for fname, (ino, offset, sealed) in checkpoints.items():
+            path = DATA_DIR / fname
+            records, sizes = store.dump(FILE_TO_KEY[fname])
+            files[fname] = {
+                "sealed":  list(sealed),
+                "ino":     ino,
+                "offset":  offset,
+                "head":    _file_head(path) if ino is not None and path.exists() else b"",
+                "records": records,
+                "sizes":   sizes,
+            }
+    except Exception:
+        snapshot_lock.release()
+        raise
+
+    def dump():
+        try:
+            tmp = SNAPSHOT_PATH.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump({"version": SNAPSHOT_VERSION, "files": files}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, SNAPSHOT_PATH)
+        except Exception as e:
+            print(f"[API] Snapshot failed: {e}")
+        finally:
+            snapshot_lock.release()
+    threading.Thread(target=dump, daemon=True).start()
 
 def load_existing():
+    t0          = time.time()
+    snap        = _read_snapshot()
+    jobs, meta  = [], []
+    checkpoints = {}
+    restored    = 0
     for fname, key in FILE_TO_KEY.items():
-        path = DATA_DIR / fname
-        if not path.exists():
+        path   = DATA_DIR / fname
+        sealed = list_segments(fname)
+        segments[fname] = [n for n, _ in sealed]
+        if SEGMENT_COMPRESS:
+            for _, p in sealed:
+                if p.suffix != ".gz":
+                    _compress_jobs.put(p)   # sealed by a run that stopped before compressing
+        st = path.stat() if path.exists() else None
+        if not sealed and st is None:
             continue
-        with open(path) as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    obj    = json.loads(line)
-                    domain = obj.get("domain", "unknown")
-                    with store_lock:
-                        store[key][domain].append(obj)
-                except Exception:
-                    pass
-    print(f"[API] Loaded existing data from {DATA_DIR}")
+
+        cached = snap.get(fname)
+        resume = None                       # (path, offset) the snapshot's live file reached
+        if cached and cached["offset"]:
+            head = cached["head"]
+            if (st and cached["ino"] == st.st_ino and cached["offset"] <= st.st_size
+                    and _file_head(path, len(head)) == head):
+                resume = path
+            else:                           # sealed since the snapshot?
+                resume = next((p for n, p in sealed if n not in cached["sealed"]
+                               and _file_head(p, len(head)) == head), None)
+            if resume is None:
+                cached = None               # rewritten in place: parse it all again
+        if cached:
+            store.extend(key, cached["records"], cached["sizes"])
+            restored += len(cached["records"])
+            if key == "bodies":             # snapshotted records may point at files sealed since
+                if resume is not None and resume != path:
+                    _BodySource.moved(path, resume, cached["ino"])
+                for _, p in sealed:
+                    if p.suffix == ".gz":
+                        _BodySource.moved(p.with_suffix(""), p)
+        covered = set(cached["sealed"]) if cached else ()
+
+        for n, p in sealed:
+            if n not in covered:
+                src = _BodySource.of(p) if key == "bodies" else None
+                for job in _file_jobs(p, cached["offset"] if p == resume else 0)[0]:
+                    jobs.append(job + (src is not None,))
+                    meta.append((key, src))
+        if st is None:
+            checkpoints[fname] = (None, 0, segments[fname])
+            continue
+        src = _BodySource.of(path) if key == "bodies" else None
+        live, end = _file_jobs(path, cached["offset"] if path == resume else 0)
+        for job in live:
+            jobs.append(job + (src is not None,))
+            meta.append((key, src))
+        file_positions[fname] = end
+        checkpoints[fname]    = (st.st_ino, end, segments[fname])
+
+    todo   = sum(os.path.getsize(p) if b is None else b - a for p, a, b, _ in jobs)
+    parsed = 0
+    for (key, src), (objs, sizes, offsets, _) in zip(meta, _parse_jobs(jobs, parallel=todo >= LOAD_PARALLEL_MIN)):
+        store.extend(key, _out_of_line(key, objs, offsets, sizes, src), sizes)
+        parsed += len(objs)
+    print(f"[API] Loaded existing data from {DATA_DIR}: {restored} from snapshot, "
+          f"{parsed} parsed ({todo >> 10} KiB) in {time.time() - t0:.2f}s")
+    if parsed or not snap:
+        write_snapshot(checkpoints)
 
 # ── File watcher ──────────────────────────────────────────────────────────────
 
-file_positions = {}
+WATCH_INTERVAL = 0.5         # polling period where inotify is unavailable
+INOTIFY_RESCAN = 30          # s of inotify silence before every file is rescanned anyway
+INGEST_CHUNK   = 1 << 20     # bytes read (and decoded as one batch) per pass
+RATE_WINDOW    = 10          # s of history behind lines_per_sec
+
+IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE, IN_Q_OVERFLOW = 0x2, 0x8, 0x80, 0x100, 0x4000
+
+def _inotify_open(directory):
+    """inotify fd watching `directory`, or None where inotify is unavailable."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes, ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd   = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(fd, str(directory).encode(), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except Exception:
+        return None
+
+def _inotify_wait(fd, timeout):
+    """Block up to `timeout` s. Returns changed file names, or None to rescan all."""
+    ready, _, _ = select.select([fd], [], [], timeout)
+    if not ready:
+        return None
+    try:
+        buf = os.read(fd, 64 * 1024)
+    except BlockingIOError:
+        return set()
+    names, i = set(), 0
+    while i + 16 <= len(buf):
+        _wd, mask, _cookie, size = struct.unpack_from("iIII", buf, i)
+        if mask & IN_Q_OVERFLOW:
+            return None
+        names.add(buf[i + 16:i + 16 + size].rstrip(b"\0").decode(errors="replace"))
+        i += 16 + size
+    return names
+
+
+class _Tail:
+    """Open handle on one capture file. Follows rotation and truncation."""
+
+    def __init__(self, fname):
+        self.fname   = fname
+        self.path    = DATA_DIR / fname
+        self.f       = None
+        self.ino     = None
+        self.src     = None     # _BodySource for files whose records point back in
+        self.pos     = 0        # file offset where `pending` starts
+        self.pending = b""      # trailing partial line, waiting for its newline
+        self.seal_after = 0     # time before which sealing is not retried
+
+    def read(self):
+        """[(data, file offset, source)] chunks of complete lines since the last call."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            st = None
+        chunks = []
+        if self.f and (st is None or st.st_ino != self.ino):
+            while True:                     # rotated: finish the old file first
+                got = self._drain()
+                if not got:
+                    break
+                chunks.append(got)
+            self.f.close()
+            self.f, self.src, self.pending = None, None, b""
+            file_positions[self.fname] = 0
+        if st is None:
+            return chunks
+        if self.f is None:
+            self.f   = open(self.path, "rb")
+            self.ino = st.st_ino
+            self.pos = min(file_positions.get(self.fname, 0), st.st_size)
+            self.f.seek(self.pos)
+            if FILE_TO_KEY[self.fname] == "bodies":
+                self.src = _BodySource.of(self.path, self.f)
+        elif st.st_size < self.f.tell():
+            self.f.seek(0)                  # truncated in place
+            self.pos, self.pending = 0, b""
+        elif st.st_size == self.f.tell():
+            return chunks
+        got = self._drain()
+        if got:
+            chunks.append(got)
+        file_positions[self.fname] = self.pos
+        return chunks
+
+    def _drain(self):
+        data = self.pending + self.f.read(INGEST_CHUNK)
+        cut  = data.rfind(b"\n") + 1
+        while not cut:                      # one line longer than a chunk
+            more = self.f.read(INGEST_CHUNK)
+            if not more:
+                break
+            data += more
+            cut = data.rfind(b"\n") + 1
+        self.pending = data[cut:]
+        if not cut:
+            return None
+        base, self.pos = self.pos, self.pos + cut
+        return data[:cut], base, self.src
+
+
+ingest_stats = {"lines": 0, "bytes": 0, "batches": 0, "errors": 0}
+ingest_lock  = threading.Lock()
+_ingest_window = deque()     # (time, lines) per batch within RATE_WINDOW
+
+def _ingest_batch(key, data, base=0, src=None):
+    """Decode a chunk of lines and publish it with one lock round per structure."""
+    objs, sizes, offsets, errors = _decode_chunk(data, base)
+    if objs:
+        store.extend(key, _out_of_line(key, objs, offsets, sizes, src), sizes)
+        live_feed.extend(objs)
+    now = time.time()
+    with ingest_lock:
+        ingest_stats["lines"]   += len(objs)
+        ingest_stats["bytes"]   += len(data)
+        ingest_stats["batches"] += 1
+        ingest_stats["errors"]  += errors
+        _ingest_window.append((now, len(objs)))
+        while _ingest_window[0][0] < now - RATE_WINDOW:
+            _ingest_window.popleft()
+    return len(objs)
+
+def get_ingest_stats():
+    now = time.time()
+    with ingest_lock:
+        while _ingest_window and _ingest_window[0][0] < now - RATE_WINDOW:
+            _ingest_window.popleft()
+        recent = sum(n for _, n in _ingest_window)
+        return dict(ingest_stats, lines_per_sec=round(recent / RATE_WINDOW, 1))
 
 def watch_files():
+    tails = {fname: _Tail(fname) for fname in FILE_TO_KEY}
+    fd    = _inotify_open(DATA_DIR)
+    print(f"[API] File watcher: {'inotify' if fd is not None else 'polling'}")
+    dirty, last_snapshot = False, time.time()
     while True:
-        for fname, key in FILE_TO_KEY.items():
-            path = DATA_DIR / fname
-            if not path.exists():
+        if fd is not None:
+            names = _inotify_wait(fd, INOTIFY_RESCAN)
+        else:
+            time.sleep(WATCH_INTERVAL)
+            names = None
+        for fname in (FILE_TO_KEY if names is None else names):
+            key = FILE_TO_KEY.get(fname)
+            if not key:
                 continue
-            pos = file_positions.get(fname, 0)
+            tail = tails[fname]
             try:
-                with open(path) as f:
-                    f.seek(pos)
-                    for line in f:
-                        line = line.strip()
-                        if not line:
-                            continue
-                        try:
-                            obj    = json.loads(line)
-                            domain = obj.get("domain", "unknown")
-                            with store_lock:
-                                store[key][domain].append(obj)
-                            with live_feed_lock:
-                                live_feed.append(obj)
-                                if len(live_feed) > MAX_LIVE:
-                                    live_feed.pop(0)
-                        except Exception:
-                            pass
-                    file_positions[fname] = f.tell()
-            except Exception:
-                pass
-        time.sleep(0.5)
+                while True:
+                    chunks = tail.read()
+                    if not chunks:
+                        break
+                    for chunk in chunks:
+                        _ingest_batch(key, *chunk)
+                    dirty = True
+                if (SEGMENT_BYTES and tail.f and tail.pos >= SEGMENT_BYTES
+                        and time.time() >= tail.seal_after and seal_segment(tail)):
+                    for chunk in tail.read():   # lines that landed just before the rename
+                        _ingest_batch(key, *chunk)
+            except Exception as e:
+                print(f"[API] Ingest {fname} failed: {e}")
+                with ingest_lock:
+                    ingest_stats["errors"] += 1
+        if dirty and time.time() - last_snapshot > SNAPSHOT_INTERVAL:
+            write_snapshot({t.fname: (t.ino if t.f else None, file_positions.get(t.fname, 0) if t.f else 0,
+                                      segments.get(t.fname, ()))
+                            for t in tails.values() if t.f or segments.get(t.fname)})
+            dirty, last_snapshot = False, time.time()
 
 # ── Send command to C host ────────────────────────────────────────────────────
 
@@ -274,109 +2552,23 @@ def scrape_url(url, selector, limit=50):
 # ── NEW: WebSocket helper functions ───────────────────────────────────────────
 
 def get_ws_frames(domain=None, flags_filter=None, limit=200, skip_heartbeat=True):
-    """Return WS frames, optionally filtered by domain, flags, excluding heartbeats."""
-    with store_lock:
-        if domain:
-            frames = list(store["ws_frames"].get(domain, []))
-        else:
-            frames = [f for v in store["ws_frames"].values() for f in v]
-
-    # Newest first
-    frames.sort(key=lambda x: x.get("timestamp", 0), reverse=True)
+    """Return WS frames newest first, optionally filtered by domain, flags, excluding heartbeats."""
+    if isinstance(flags_filter, str):
+        flags_filter = [flags_filter]
+    return store.newest("ws_frames", limit, domain, any_of=flags_filter or (),
+                        none_of=("HEARTBEAT",) if skip_heartbeat else ())
 
-    # Filter heartbeats (ping/pong)
-    if skip_heartbeat:
-        frames = [f for f in frames if "HEARTBEAT" not in (f.get("flags") or [])]
 
-    # Filter by specific flags
-    if flags_filter:
-        if isinstance(flags_filter, str):
-            flags_filter = [flags_filter]
-        frames = [f for f in frames if any(fl in (f.get("flags") or []) for fl in flags_filter)]
-
-    return frames[:limit]
+def get_ws_connections(domain=None, open_only=False):
+    """Return WebSocket connection summaries, newest opened first."""
+    return ws_connections.connections(domain, open_only)
 
 
-def get_ws_connections(domain=None, open_only=False):
-    """Return WebSocket connection lifecycle events."""
-    with store_lock:
-        if domain:
-            events = list(store["ws_connections"].get(domain, []))
-        else:
-            events = [e for v in store["ws_connections"].values() for e in v]
-
-    # Group by requestId — build connection summaries
-    conns = {}
-    for ev in events:
-        rid  = ev.get("requestId") or ev.get("request_id", "unknown")
-        t    = ev.get("type", "")
-        if rid not in conns:
-            conns[rid] = {
-                "requestId": rid,
-                "url":       ev.get("url", ""),
-                "domain":    ev.get("domain", ""),
-                "tabId":     ev.get("tabId"),
-                "openedAt":  None,
-                "closedAt":  None,
-                "handshake": None,
-                "open":      True,
-                "summary":   None,
-            }
-        if t == "websocket_opened":
-            conns[rid]["openedAt"] = ev.get("timestamp")
-            conns[rid]["url"]      = ev.get("url", conns[rid]["url"])
-        elif t == "websocket_handshake":
-            conns[rid]["handshake"] = {
-                "status":  ev.get("status"),
-                "headers": ev.get("headers", {}),
-            }
-        elif t == "websocket_closed":
-            conns[rid]["closedAt"] = ev.get("timestamp")
-            conns[rid]["open"]     = False
-            conns[rid]["summary"]  = ev.get("summary")
-
-    result = list(conns.values())
-    result.sort(key=lambda x: x.get("openedAt") or 0, reverse=True)
-
-    if open_only:
-        result = [c for c in result if c["open"]]
-
-    return result
-
-
-def get_ws_stats(domain=None):
-    """Aggregate stats across all captured WS traffic."""
-    frames = get_ws_frames(domain=domain, skip_heartbeat=False, limit=999999)
-    conns  = get_ws_connections(domain=domain)
-
-    total_recv = sum(1 for f in frames if f.get("direction") == "recv")
-    total_sent = sum(1 for f in frames if f.get("direction") == "sent")
-
-    # Flag frequency
-    flag_counts = {}
-    for f in frames:
-        for fl in (f.get("flags") or []):
-            flag_counts[fl] = flag_counts.get(fl, 0) + 1
-
-    # Collect all extracted numeric values
-    extracted_values = {}
-    for f in frames:
-        for k, v in (f.get("extracted") or {}).items():
-            if k not in extracted_values:
-                extracted_values[k] = []
-            extracted_values[k].append(v)
-
-    # Summarize numeric fields
-    value_stats = {}
-    for k, vals in extracted_values.items():
-        if vals:
-            value_stats[k] = {
-                "count": len(vals),
-                "min":   min(vals),
-                "max":   max(vals),
-                "avg":   round(sum(vals) / len(vals), 4),
-                "last":  vals[-1],
-            }
+def get_ws_stats(domain=None, request_id=None):
+    """Aggregate stats across captured WS traffic, or for one connection."""
+    conns = get_ws_connections(domain=domain)
+    if request_id:
+        conns = [c for c in conns if c["requestId"] == request_id]
 
     # Unique URLs seen
     ws_urls = list({c["url"] for c in conns if c.get("url")})
@@ -388,13 +2580,7 @@ def get_ws_stats(domain=None):
             "closed": sum(1 for c in conns if not c["open"]),
             "urls":   ws_urls,
         },
-        "frames": {
-            "total":  len(frames),
-            "recv":   total_recv,
-            "sent":   total_sent,
-        },
-        "flags":          flag_counts,
-        "extractedValues": value_stats,
+        **ws_stats.summary(domain, request_id),
     }
 
 
@@ -408,72 +2594,29 @@ def get_ws_interesting(domain=None, limit=100):
 # ── Data queries ──────────────────────────────────────────────────────────────
 
 def get_bearer_tokens(domain=None):
-    tokens = []
-    with store_lock:
-        domains = [domain] if domain else list(store["requests"].keys())
-        for d in domains:
-            for req in store["requests"][d]:
-                headers = req.get("headers", {})
-                auth = headers.get("authorization") or headers.get("Authorization", "")
-                if auth.lower().startswith("bearer "):
-                    tokens.append({
-                        "domain":    d,
-                        "token":     auth[7:],
-                        "url":       req.get("url"),
-                        "timestamp": req.get("timestamp")
-                    })
-    seen = set(); unique = []
-    for t in tokens:
-        if t["token"] not in seen:
-            seen.add(t["token"]); unique.append(t)
-    return unique
+    return bearer_tokens.tokens(domain)
 
 def get_auth_cookies(domain=None):
-    with store_lock:
-        domains = [domain] if domain else list(store["auth"].keys())
-        return {d: store["auth"][d] for d in domains}
+    if domain:
+        return {domain: store.items("auth", domain)}
+    return store.by_domain("auth")
 
 def get_api_endpoints(domain=None):
-    with store_lock:
-        domains = [domain] if domain else list(store["requests"].keys())
-        endpoints = defaultdict(list)
-        for d in domains:
-            for req in store["requests"][d]:
-                flags = req.get("flags", [])
-                if "API" in flags or "AUTH_FLOW" in flags:
-                    endpoints[d].append({
-                        "method":    req.get("method"),
-                        "url":       req.get("url"),
-                        "flags":     flags,
-                        "postData":  req.get("postData"),
-                        "timestamp": req.get("timestamp")
-                    })
-        return dict(endpoints)
+    return endpoint_catalog.endpoints(domain)
 
 def get_domains():
-    with store_lock:
-        all_domains = set()
-        for key in store:
-            all_domains.update(store[key].keys())
-        return sorted(all_domains)
+    return store.sorted_domains()
 
 def get_stats():
-    with store_lock:
-        stats = {}
-        for key in store:
-            total = sum(len(v) for v in store[key].values())
-            stats[key] = {"total": total, "domains": list(store[key].keys())}
-        return stats
+    return store.stats()
 
 # NEW: Site intel — all tokens, cookies, endpoints, DOM for one domain
 def get_site_intel(domain):
     tokens    = get_bearer_tokens(domain)
     auth      = get_auth_cookies(domain)
     endpoints = get_api_endpoints(domain)
-    with store_lock:
-        dommap = store["dommaps"].get(domain, [])
-        # Latest DOM map only
-        latest_dom = dommap[-1] if dommap else None
+    # Latest DOM map only
+    latest_dom = store.latest("dommaps", domain)
     return {
         "domain":    domain,
         "tokens":    tokens,
@@ -488,12 +2631,11 @@ def export_zip(domain=None):
     with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
         if domain:
             # Export single domain
-            with store_lock:
-                for key in store:
-                    items = store[key].get(domain, [])
-                    if items:
-                        zf.writestr(f"{domain}/{key}.json",
-                                    json.dumps(items, indent=2))
+            for key in store.kinds():
+                items = store.items(key, domain)
+                if items:
+                    zf.writestr(f"{domain}/{key}.json",
+                                json.dumps(items, indent=2, default=_json_default))
             # HTML files for this domain
             for hf in DATA_DIR.glob("html_*.json"):
                 try:
@@ -506,6 +2648,8 @@ def export_zip(domain=None):
             # Export everything
             for fname in DATA_DIR.glob("*.jsonl"):
                 zf.write(str(fname), fname.name)
+            for fname in DATA_DIR.glob("*.jsonl.gz"):    # compressed sealed segments
+                zf.write(str(fname), fname.name)
             # Include WS-specific files
             for fname in DATA_DIR.glob("ws_*.jsonl"):
                 zf.write(str(fname), fname.name)
@@ -520,48 +2664,84 @@ def export_zip(domain=None):
 # ── /api/v1/ helpers ──────────────────────────────────────────────────────────
 
 def get_fingerprint(domain=None):
-    with store_lock:
-        if domain:
-            fps = store["fingerprints"].get(domain, [])
-            return fps[-1].get("fingerprint", {}) if fps else {}
-        return {d: v[-1].get("fingerprint", {}) for d, v in store["fingerprints"].items() if v}
+    if domain:
+        fp = store.latest("fingerprints", domain)
+        return fp.get("fingerprint", {}) if fp else {}
+    return {d: v.get("fingerprint", {}) for d, v in store.latest("fingerprints").items()}
 
 def get_localstorage(domain=None):
-    result = {}
-    with store_lock:
-        domains = [domain] if domain else list(store["storage"].keys())
-        for d in domains:
-            ls, ss = {}, {}
-            for evt in store["storage"][d]:
-                data = evt.get("data", {})
-                if isinstance(data, dict):
-                    ls.update(data.get("localStorage", {}))
-                    ss.update(data.get("sessionStorage", {}))
-            if ls or ss:
-                result[d] = {"localStorage": ls, "sessionStorage": ss}
-    return result.get(domain, {}) if domain else result
+    return storage_state.get(domain)
+
+QUERY_LIMIT = 100
+
+def _dig(obj, path):
+    for part in path.split("."):
+        if obj is None:
+            return None
+        obj = obj.get(part) if hasattr(obj, "get") else None
+    return obj
+
+def _has_header(obj, name, value=None):
+    """Case-insensitive header match; `value` is a substring of the header value."""
+    for k, v in (obj.get("headers") or {}).items():
+        if k.lower() == name and (value is None or value in str(v)):
+            return True
+    return False
+
+def run_query(qs):
+    """Filtered records for /api/v1/query, newest first.
+
+    Index-backed: kind, domain, flag (any of, comma-separated), method,
+    status, since / until. Checked per candidate: url (substring), url_re,
+    header (+ header_value substring). `fields` projects the result onto
+    comma-separated (dotted) paths. Raises ValueError for bad parameters.
+    """
+    arg   = lambda k: qs.get(k, [None])[0]
+    kind  = arg("kind") or "requests"
+    if kind not in CAPTURE_KINDS:
+        raise ValueError(f"unknown kind {kind!r}")
+    flags = tuple(f for f in (arg("flag") or "").split(",") if f)
+    terms = []
+    if arg("method"):
+        terms.append(("method", arg("method").upper()))
+    if arg("status"):
+        terms.append(("status", int(arg("status")) if arg("status").isdigit() else arg("status")))
+    since = float(arg("since")) if arg("since") else None
+    until = float(arg("until")) if arg("until") else None
+    limit = max(1, min(int(arg("limit") or QUERY_LIMIT), PAGE_MAX))
+    url, header, hval = arg("url"), (arg("header") or "").lower() or None, arg("header_value")
+    try:
+        url_re = re.compile(arg("url_re")) if arg("url_re") else None
+    except re.error as e:
+        raise ValueError(f"bad url_re: {e}")
+    fields = [f for f in (arg("fields") or "").split(",") if f]
+
+    runs = []
+    for r, (_, objs) in enumerate(store.select(kind, arg("domain"), flags, terms, since, until)):
+        hits = []
+        for obj in objs:
+            u = obj.get("url") or ""
+            if url and url not in u:
+                continue
+            if url_re and not url_re.search(u):
+                continue
+            if header and not _has_header(obj, header, hval):
+                continue
+            hits.append(obj)
+            if len(hits) == limit:
+                break
+        runs.append([(-_ts(o), r, i, o) for i, o in enumerate(hits)])
+    picked = [run[-1] for run in islice(heapq.merge(*runs), limit)]
+    if fields:
+        return [{f: _dig(o, f) for f in fields} for o in picked]
+    return picked
 
 def get_session_all(domain=None):
     fp      = get_fingerprint(domain)
     ls_data = get_localstorage(domain)
     tokens  = get_bearer_tokens(domain)
     auth    = get_auth_cookies(domain)
-    with store_lock:
-        if domain:
-            raw = store["cookies"].get(domain, [])
-            raw_auth = store["auth"].get(domain, [])
-        else:
-            raw = [evt for d_list in store["cookies"].values() for evt in d_list]
-            raw_auth = [evt for d_list in store["auth"].values() for evt in d_list]
-        seen_sc = set()
-        flat_cookies = []
-        for evt in (raw + raw_auth):
-            c = evt.get("cookie")
-            if c and not evt.get("removed", False):
-                k = (c.get("name"), c.get("domain"))
-                if k not in seen_sc:
-                    seen_sc.add(k)
-                    flat_cookies.append(c)
+    flat_cookies = cookie_jar.cookies(domain)
     ls = ls_data.get("localStorage", {}) if isinstance(ls_data, dict) else {}
     ss = ls_data.get("sessionStorage", {}) if isinstance(ls_data, dict) else {}
     return {
@@ -577,18 +2757,7 @@ def export_env(domain=None):
     lines    = ["#!/usr/bin/env bash", "# SCRAPY Session Export",
                 f"# Generated: {datetime.now(timezone.utc).isoformat()}", ""]
     tokens   = get_bearer_tokens(domain)
-    with store_lock:
-        doms = [domain] if domain else list(store["cookies"].keys())
-        seen_env = set()
-        all_cookies = []
-        for d in doms:
-            for evt in (store["cookies"].get(d, []) + store["auth"].get(d, [])):
-                c = evt.get("cookie")
-                if c and not evt.get("removed", False):
-                    k = (c.get("name"), c.get("domain"))
-                    if k not in seen_env:
-                        seen_env.add(k)
-                        all_cookies.append(c)
+    all_cookies = cookie_jar.cookies(domain)
     if tokens:
         lines.append(f'export SCRAPY_BEARER_TOKEN="{tokens[0]["token"]}"')
     if all_cookies:
@@ -606,36 +2775,16 @@ def export_env(domain=None):
     return "\n".join(lines)
 
 def export_full_json(domain=None):
-    with store_lock:
-        all_keys  = set().union(*[store[k].keys() for k in store])
-        doms      = [domain] if domain else list(all_keys)
-        def collect(key):
-            if domain:
-                return list(store[key].get(domain, []))
-            return [item for d_list in store[key].values() for item in d_list]
-        all_requests  = collect("requests")
-        all_responses = collect("responses")
-        all_ws        = collect("websockets")
-        all_cookies   = collect("cookies")
-        all_dommaps   = collect("dommaps")
-        all_fps       = collect("fingerprints")
-        all_storage   = collect("storage")
-    flat_cookies = []
-    seen_ck = set()
-    all_auth_evts = collect("auth")
-    for evt in (all_cookies + all_auth_evts):
-        c = evt.get("cookie")
-        if c and not evt.get("removed", False):
-            k = (c.get("name"), c.get("domain"))
-            if k not in seen_ck:
-                seen_ck.add(k)
-                flat_cookies.append(c)
+    all_requests  = store.items("requests", domain)
+    all_responses = store.items("responses", domain)
+    all_ws        = store.items("websockets", domain)
+    all_dommaps   = store.items("dommaps", domain)
+    all_fps       = store.items("fingerprints", domain)
+    flat_cookies  = cookie_jar.cookies(domain)
     ls_m, ss_m   = {}, {}
-    for evt in all_storage:
-        data = evt.get("data", {})
-        if isinstance(data, dict):
-            ls_m.update(data.get("localStorage", {}))
-            ss_m.update(data.get("sessionStorage", {}))
+    for st in ([storage_state.get(domain)] if domain else storage_state.get().values()):
+        ls_m.update(st.get("localStorage", {}))
+        ss_m.update(st.get("sessionStorage", {}))
     latest_fp = all_fps[-1].get("fingerprint", {}) if all_fps else {}
     tokens    = get_bearer_tokens(domain)
     return {
@@ -663,32 +2812,20 @@ def export_full_json(domain=None):
 
 def export_jsonl(domain=None):
     lines = []
-    with store_lock:
-        for key in store:
-            doms = [domain] if domain else list(store[key].keys())
-            for d in doms:
-                for item in store[key][d]:
-                    lines.append(json.dumps(item))
+    for key in store.kinds():
+        for items in ([store.items(key, domain)] if domain else store.by_domain(key).values()):
+            for item in items:
+                lines.append(json.dumps(item, default=_json_default))
     return "\n".join(lines)
 
 def export_txt(domain=None):
     tokens    = get_bearer_tokens(domain)
     endpoints = get_api_endpoints(domain)
     fp        = get_fingerprint(domain)
-    with store_lock:
-        doms = [domain] if domain else list(set().union(*[store[k].keys() for k in store]))
-        total_reqs = sum(len(store["requests"].get(d,[])) for d in doms)
-        total_ws   = sum(len(store["websockets"].get(d,[])) for d in doms)
-        seen_txt = set()
-        all_cookies = []
-        for d in doms:
-            for evt in (store["cookies"].get(d, []) + store["auth"].get(d, [])):
-                c = evt.get("cookie")
-                if c and not evt.get("removed", False):
-                    k = (c.get("name"), c.get("domain"))
-                    if k not in seen_txt:
-                        seen_txt.add(k)
-                        all_cookies.append(c)
+    doms = [domain] if domain else store.domains()
+    total_reqs = sum(store.count("requests", d) for d in doms)
+    total_ws   = sum(store.count("websockets", d) for d in doms)
+    all_cookies = cookie_jar.cookies(domain)
     lines = [
         "="*60, "  SCRAPY — Session Export (Text Format)",
         f"  Generated : {datetime.now(timezone.utc).isoformat()}",
@@ -721,80 +2858,87 @@ def export_txt(domain=None):
     if ep_list:
         lines.append("[API ENDPOINTS]")
         for e in ep_list[:100]:
-            lines.append(f"  {e.get('method','?')} {e.get('url','')}")
+            lines.append(f"  {'/'.join(str(m) for m in e['methods'])} {e['template']}  ({e['hits']} hits)")
         lines.append("")
     return "\n".join(lines)
 
 def export_har(domain=None):
-    with store_lock:
-        doms   = [domain] if domain else list(store["requests"].keys())
-        entries = []
-        for d in doms:
-            reqs   = store["requests"].get(d, [])
-            resps  = store["responses"].get(d, [])
-            bodies = store["bodies"].get(d, [])
-            body_map = {b.get("requestId"): b for b in bodies if b.get("requestId")}
-            resp_map = {r.get("requestId"): r for r in resps  if r.get("requestId")}
-            for req in reqs:
-                rid  = req.get("requestId")
-                resp = resp_map.get(rid, {})
-                body = body_map.get(rid, {})
-                ts   = req.get("timestamp", 0) or 0
-                started = datetime.utcfromtimestamp(ts/1000).strftime('%Y-%m-%dT%H:%M:%S.000Z')
-                rq_hdrs = [{"name":k,"value":str(v)} for k,v in (req.get("headers") or {}).items()]
-                rs_hdrs = [{"name":k,"value":str(v)} for k,v in (resp.get("headers") or {}).items()]
-                body_text = (body.get("body","") or "") if not body.get("base64") else ""
-                entry = {
-                    "startedDateTime": started, "time": 0,
-                    "request": {
-                        "method": req.get("method","GET"), "url": req.get("url",""),
-                        "httpVersion":"HTTP/1.1","cookies":[],"headers":rq_hdrs,
-                        "queryString":[],"headersSize":-1,"bodySize":len(req.get("postData") or "") or -1,
-                    },
-                    "response": {
-                        "status": resp.get("status",0),"statusText":resp.get("statusText",""),
-                        "httpVersion":"HTTP/1.1","cookies":[],"headers":rs_hdrs,
-                        "content":{"size":-1,"mimeType":resp.get("mimeType","text/plain"),"text":body_text},
-                        "redirectURL":"","headersSize":-1,"bodySize":len(body_text) or -1,
-                    },
-                    "cache":{},"timings":{"send":0,"wait":0,"receive":0},
-                    "_scrapy":{"domain":d,"flags":req.get("flags",[])},
-                }
-                if req.get("postData"):
-                    ct = (req.get("headers") or {}).get("content-type","text/plain")
-                    entry["request"]["postData"] = {"mimeType":ct,"text":str(req["postData"])}
-                entries.append(entry)
+    doms    = [domain] if domain else store.domains("requests")
+    entries = []
+    for d in doms:
+        for req, resp, body in store.join("requests", d):
+            resp = resp or {}
+            body = body or {}
+            ts   = req.get("timestamp", 0) or 0
+            started = datetime.utcfromtimestamp(ts/1000).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+            rq_hdrs = [{"name":k,"value":str(v)} for k,v in (req.get("headers") or {}).items()]
+            rs_hdrs = [{"name":k,"value":str(v)} for k,v in (resp.get("headers") or {}).items()]
+            body_text = (body.get("body","") or "") if not body.get("base64") else ""
+            entry = {
+                "startedDateTime": started, "time": 0,
+                "request": {
+                    "method": req.get("method","GET"), "url": req.get("url",""),
+                    "httpVersion":"HTTP/1.1","cookies":[],"headers":rq_hdrs,
+                    "queryString":[],"headersSize":-1,"bodySize":len(req.get("postData") or "") or -1,
+                },
+                "response": {
+                    "status": resp.get("status",0),"statusText":resp.get("statusText",""),
+                    "httpVersion":"HTTP/1.1","cookies":[],"headers":rs_hdrs,
+                    "content":{"size":-1,"mimeType":resp.get("mimeType","text/plain"),"text":body_text},
+                    "redirectURL":"","headersSize":-1,"bodySize":len(body_text) or -1,
+                },
+                "cache":{},"timings":{"send":0,"wait":0,"receive":0},
+                "_scrapy":{"domain":d,"flags":req.get("flags",[])},
+            }
+            if req.get("postData"):
+                ct = (req.get("headers") or {}).get("content-type","text/plain")
+                entry["request"]["postData"] = {"mimeType":ct,"text":str(req["postData"])}
+            entries.append(entry)
     return {"log":{"version":"1.2","creator":{"name":"SCRAPY","version":"2.1.0"},"pages":[],"entries":entries}}
 
 def export_csv_data(domain=None):
     output = io.StringIO()
     writer = csv.writer(output)
     writer.writerow(["timestamp_ms","datetime","domain","method","url","status","mime_type","flags","has_bearer","request_id"])
-    with store_lock:
-        doms     = [domain] if domain else list(store["requests"].keys())
-        resp_map = {}
-        for d in doms:
-            for r in store["responses"].get(d,[]):
-                resp_map[r.get("requestId")] = r
-        for d in doms:
-            for req in store["requests"].get(d,[]):
-                ts    = req.get("timestamp", 0) or 0
-                flags = req.get("flags", [])
-                resp  = resp_map.get(req.get("requestId"), {})
-                writer.writerow([
-                    ts,
-                    datetime.utcfromtimestamp(ts/1000).isoformat() if ts else "",
-                    d,
-                    req.get("method",""),
-                    req.get("url",""),
-                    resp.get("status",""),
-                    resp.get("mimeType",""),
-                    "|".join(flags),
-                    "BEARER_TOKEN" in flags,
-                    req.get("requestId",""),
-                ])
+    doms = [domain] if domain else store.domains("requests")
+    for d in doms:
+        for req, resp in store.join("requests", d, ("responses",)):
+            ts    = req.get("timestamp", 0) or 0
+            flags = req.get("flags", [])
+            resp  = resp or {}
+            writer.writerow([
+                ts,
+                datetime.utcfromtimestamp(ts/1000).isoformat() if ts else "",
+                d,
+                req.get("method",""),
+                req.get("url",""),
+                resp.get("status",""),
+                resp.get("mimeType",""),
+                "|".join(flags),
+                "BEARER_TOKEN" in flags,
+                req.get("requestId",""),
+            ])
     return output.getvalue()
 
+# ── Paging ────────────────────────────────────────────────────────────────────
+
+PAGE_LIMIT = 100             # records per page when ?limit= is not given
+PAGE_MAX   = 10_000
+
+def encode_cursor(pos):
+    """Opaque cursor for a {domain: last seq returned} position."""
+    raw = json.dumps(pos, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        pos = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if isinstance(pos, dict) and all(isinstance(v, int) for v in pos.values()):
+            return pos
+    except Exception:
+        pass
+    raise ValueError("invalid cursor")
+
 # ── HTTP handler ──────────────────────────────────────────────────────────────
 
 class ScraperAPI(BaseHTTPRequestHandler):
@@ -839,7 +2983,7 @@ class ScraperAPI(BaseHTTPRequestHandler):
 
 
     def send_json(self, data, status=200):
-        body = json.dumps(data, indent=2).encode()
+        body = json.dumps(data, indent=2, default=_json_default).encode()
         self.send_response(status)
         self.send_header("Content-Type", "application/json")
         self.send_header("Content-Length", len(body))
@@ -847,6 +2991,23 @@ class ScraperAPI(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(body)
 
+    def send_page(self, key, qs, domain):
+        """Paged reply for ?cursor= / limit / since / until. False if none were
+        given, leaving the caller to send the full list as before."""
+        if not any(p in qs for p in ("cursor", "limit", "since", "until")):
+            return False
+        try:
+            cursor = decode_cursor(qs["cursor"][0]) if "cursor" in qs else None
+            limit  = max(1, min(int(qs.get("limit", [PAGE_LIMIT])[0]), PAGE_MAX))
+            since  = float(qs["since"][0]) if "since" in qs else None
+            until  = float(qs["until"][0]) if "until" in qs else None
+        except ValueError as e:
+            self.send_json({"error": f"bad paging parameter: {e}"}, 400)
+            return True
+        items, pos, more = store.page(key, domain, cursor, limit, since, until)
+        self.send_json({"items": items, "next_cursor": encode_cursor(pos), "has_more": more})
+        return True
+
     def send_html(self, html):
         if not html:
             html = "<h1>SCRAPY — dashboard.html not found. Run the installer.</h1>"
@@ -864,17 +3025,21 @@ class ScraperAPI(BaseHTTPRequestHandler):
         self.send_header("Cache-Control", "no-cache")
         self.send_header("Access-Control-Allow-Origin", "*")
         self.end_headers()
-        last_idx = max(0, len(live_feed) - 20)
+        # EventSource reconnects send Last-Event-ID; resume right after it
+        last_id = self.headers.get("Last-Event-ID", "")
+        seq = int(last_id) + 1 if last_id.isdigit() else -1
+        if not 0 <= seq <= live_feed.next_seq:       # fresh client, or an id from before a restart
+            seq = max(0, live_feed.next_seq - 20)
         try:
             while True:
-                with live_feed_lock:
-                    current  = live_feed[last_idx:]
-                    last_idx = len(live_feed)
-                for item in current:
-                    data = f"data: {json.dumps(item)}\n\n"
-                    self.wfile.write(data.encode())
-                    self.wfile.flush()
-                time.sleep(0.5)
+                items, seq, lost = live_feed.since(seq)
+                if lost:
+                    self.wfile.write(f"event: overflow\ndata: {json.dumps({'skipped': lost})}\n\n".encode())
+                for i, item in items:
+                    self.wfile.write(f"id: {i}\ndata: {json.dumps(item)}\n\n".encode())
+                if not items and not live_feed.wait(seq, SSE_KEEPALIVE):
+                    self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
         except Exception:
             pass
 
@@ -936,21 +3101,20 @@ class ScraperAPI(BaseHTTPRequestHandler):
         elif path == "/endpoints":
             self.send_json(get_api_endpoints(domain))
         elif path == "/requests":
-            with store_lock:
-                self.send_json(store["requests"][domain] if domain else dict(store["requests"]))
+            if not self.send_page("requests", qs, domain):
+                self.send_json(store.items("requests", domain) if domain else store.by_domain("requests"))
         elif path == "/bodies":
             limit = int(qs.get("limit", [50])[0])
-            with store_lock:
-                if domain:
-                    self.send_json(store["bodies"][domain][-limit:])
-                else:
-                    self.send_json({d: v[-limit:] for d, v in store["bodies"].items()})
+            if domain:
+                self.send_json(store.tail("bodies", domain, limit))
+            else:
+                self.send_json({d: store.tail("bodies", d, limit) for d in store.domains("bodies")})
         elif path == "/cookies":
-            with store_lock:
-                self.send_json(store["cookies"][domain] if domain else dict(store["cookies"]))
+            if not self.send_page("cookies", qs, domain):
+                self.send_json(store.items("cookies", domain) if domain else store.by_domain("cookies"))
         elif path == "/dommaps":
-            with store_lock:
-                self.send_json(store["dommaps"][domain] if domain else dict(store["dommaps"]))
+            if not self.send_page("dommaps", qs, domain):
+                self.send_json(store.items("dommaps", domain) if domain else store.by_domain("dommaps"))
         elif path == "/intel":
             if not domain:
                 self.send_json({"error": "?domain= required"}, 400)
@@ -961,21 +3125,11 @@ class ScraperAPI(BaseHTTPRequestHandler):
             limit    = int(qs.get("limit", [100])[0])
             self.send_json(rust_find(selector, domain, limit))
         elif path == "/responses":
-            with store_lock:
-                if domain:
-                    reqs  = store["requests"].get(domain, [])
-                    resps = store["responses"].get(domain, [])
-                    bods  = store["bodies"].get(domain, [])
-                else:
-                    reqs  = [r for v in store["requests"].values()  for r in v]
-                    resps = [r for v in store["responses"].values() for r in v]
-                    bods  = [r for v in store["bodies"].values()    for r in v]
             # merge responses with their bodies by requestId
-            body_map = {b.get("requestId"): b.get("body") for b in bods if b.get("requestId")}
             merged = []
-            for r in resps:
+            for r, body in store.join("responses", domain, ("bodies",)):
                 entry = dict(r)
-                entry["body"] = body_map.get(r.get("requestId"))
+                entry["body"] = body.get("body") if body else None
                 merged.append(entry)
             self.send_json(merged)
         elif path == "/scrape":
@@ -987,11 +3141,14 @@ class ScraperAPI(BaseHTTPRequestHandler):
             else:
                 self.send_json(scrape_url(url, selector, limit))
         elif path == "/feed":
-            with live_feed_lock:
-                limit = int(qs.get("limit", [100])[0])
-                self.send_json(live_feed[-limit:])
+            limit = int(qs.get("limit", [100])[0])
+            self.send_json(live_feed.latest(limit))
         elif path == "/queue":
             self.send_json(queue_status())
+        elif path == "/ingest/stats":
+            self.send_json(get_ingest_stats())
+        elif path == "/retention":
+            self.send_json(store.retention_stats())
 
         # ── NEW: WebSocket endpoints ──────────────────────────────────────────
         elif path == "/websockets":
@@ -1015,7 +3172,22 @@ class ScraperAPI(BaseHTTPRequestHandler):
             self.send_json(get_ws_connections(domain=domain, open_only=open_only))
 
         elif path == "/ws/stats":
-            self.send_json(get_ws_stats(domain=domain))
+            self.send_json(get_ws_stats(domain=domain, request_id=qs.get("requestId", [None])[0]))
+
+        elif path == "/ws/series":
+            key = qs.get("key", [None])[0]
+            if not key:
+                self.send_json({"domain": domain, "keys": ws_series.keys(domain)})
+            else:
+                try:
+                    width = parse_bucket(qs.get("bucket", ["1s"])[0])
+                    since = float(qs["since"][0]) if "since" in qs else None
+                    until = float(qs["until"][0]) if "until" in qs else None
+                except ValueError as e:
+                    self.send_json({"error": str(e)}, 400)
+                else:
+                    self.send_json({"domain": domain, "key": key, "bucket": width,
+                                    "points": ws_series.buckets(key, width, domain, since, until)})
 
         elif path == "/ws/interesting":
             limit = int(qs.get("limit", [100])[0])
@@ -1034,23 +3206,35 @@ class ScraperAPI(BaseHTTPRequestHandler):
 
         # ── /api/v1/ — README-spec endpoints ─────────────────────────────────
         elif path == "/api/v1/session/cookies":
-            with store_lock:
-                if domain:
-                    raw = store["cookies"].get(domain, [])
-                    raw_auth = store["auth"].get(domain, [])
+            self.send_json(cookie_jar.cookies(domain))
+
+        elif path == "/api/v1/query":
+            try:
+                self.send_json(run_query(qs))
+            except ValueError as e:
+                self.send_json({"error": str(e)}, 400)
+
+        elif path == "/api/v1/headers/latest":
+            name = qs.get("name", [None])[0]
+            kind = qs.get("kind", ["requests"])[0]
+            if kind not in ("requests", "responses"):
+                self.send_json({"error": "kind must be requests or responses"}, 400)
+            elif not (name or domain):
+                self.send_json({"error": "?domain= or ?name= required"}, 400)
+            else:
+                self.send_json(header_index.latest(kind, domain, name))
+
+        elif path == "/api/v1/search":
+            q = qs.get("q", [""])[0]
+            if not q.strip():
+                self.send_json({"error": "?q= required"}, 400)
+            else:
+                try:
+                    limit = int(qs.get("limit", [SEARCH_LIMIT])[0])
+                except ValueError as e:
+                    self.send_json({"error": str(e)}, 400)
                 else:
-                    raw = [e for d_list in store["cookies"].values() for e in d_list]
-                    raw_auth = [e for d_list in store["auth"].values() for e in d_list]
-                seen_sc2 = set()
-                flat = []
-                for evt in (raw + raw_auth):
-                    c = evt.get("cookie")
-                    if c and not evt.get("removed", False):
-                        k = (c.get("name"), c.get("domain"))
-                        if k not in seen_sc2:
-                            seen_sc2.add(k)
-                            flat.append(c)
-            self.send_json(flat)
+                    self.send_json(search_index.search(q, domain, limit))
 
         elif path == "/api/v1/session/localstorage":
             self.send_json(get_localstorage(domain))
@@ -1065,25 +3249,28 @@ class ScraperAPI(BaseHTTPRequestHandler):
             self.send_json(get_bearer_tokens(domain))
 
         elif path == "/api/v1/requests/recent":
-            limit = int(qs.get("limit", [50])[0])
-            with store_lock:
-                if domain:
-                    self.send_json(store["requests"][domain][-limit:])
+            try:
+                limit = int(qs.get("limit", [50])[0])
+                since = float(qs["since"][0]) if "since" in qs else None
+                until = float(qs["until"][0]) if "until" in qs else None
+            except ValueError as e:
+                self.send_json({"error": str(e)}, 400)
+            else:
+                if domain and since is None and until is None:
+                    self.send_json(store.tail("requests", domain, limit))
                 else:
-                    all_reqs = [r for v in store["requests"].values() for r in v]
-                    all_reqs.sort(key=lambda x: x.get("timestamp", 0))
-                    self.send_json(all_reqs[-limit:])
+                    self.send_json(store.recent("requests", limit, domain, since, until))
 
         elif path == "/api/v1/dom/snapshot":
             url_param = qs.get("url", [None])[0]
-            with store_lock:
-                if domain:
-                    maps = list(store["dommaps"].get(domain, []))
-                else:
-                    maps = [m for v in store["dommaps"].values() for m in v]
-                if url_param:
-                    maps = [m for m in maps if url_param in (m.get("url") or "")]
-            self.send_json(maps[-1] if maps else {})
+            if url_param:
+                maps = [m for m in store.items("dommaps", domain) if url_param in (m.get("url") or "")]
+                self.send_json(maps[-1] if maps else {})
+            elif domain:
+                self.send_json(store.latest("dommaps", domain) or {})
+            else:
+                maps = store.items("dommaps")
+                self.send_json(maps[-1] if maps else {})
 
         elif path == "/api/v1/export/env":
             body = export_env(domain).encode()
@@ -1180,8 +3367,7 @@ class ScraperAPI(BaseHTTPRequestHandler):
         elif path == "/clear":
             domain = body.get("domain")
             if domain:
-                with store_lock:
-                    for key in store: store[key].pop(domain, None)
+                store.clear_domain(domain)
                 self.send_json({"cleared": domain})
             else:
                 self.send_json({"error": "no domain"}, 400)
@@ -1296,6 +3482,9 @@ if __name__ == "__main__":
     print("[API] Loading existing data...")
     load_existing()
     threading.Thread(target=watch_files, daemon=True).start()
+    threading.Thread(target=retention_worker, daemon=True).start()
+    threading.Thread(target=compress_worker, daemon=True).start()
+    threading.Thread(target=search_worker, daemon=True).start()
     print("[API] File watcher started")
     server = ThreadedHTTPServer(("0.0.0.0", API_PORT), ScraperAPI)
     print(f"[API] Dashboard → http://localhost:{API_PORT}")